@@ -0,0 +1,195 @@
+"""
+Time the layers, activations, losses and whole networks at the shapes used by the projects in this repo.
+
+    python benchmarks/bench.py run --save main                 time everything, store it as baselines/main.json
+    python benchmarks/bench.py run -k dense -k char            only cases with all of these in their name
+    python benchmarks/bench.py compare main                    time again and flag anything over 10% slower than main
+    python benchmarks/bench.py compare main new.json --threshold 0.2
+
+compare exits with 1 if anything got slower than the threshold, so it can fail a CI job. Each case is called in a
+loop until it takes at least --min-time seconds, that is repeated --repeat times and the fastest is kept, as it is the
+one least disturbed by whatever else the machine was doing. Baselines only mean something on the machine they were
+made on, so compare warns when the machine or library versions differ.
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import platform
+import sys
+import time
+
+directory = pathlib.Path(__file__).parent.absolute()
+sys.path.append(str(directory.parent))
+
+import numpy as np
+
+from cases import CASES
+
+BASELINE_FOLDER = directory / "baselines"
+DEFAULT_THRESHOLD = 0.1
+
+
+def machine() -> dict:
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+
+def select(filters: list[str]) -> list[str]:
+    return [name for name in CASES if all(text in name for text in filters)]
+
+
+def time_case(function, min_time: float, repeat: int) -> dict:
+    function()
+
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        seconds = time.perf_counter() - start
+        if seconds >= min_time:
+            break
+        loops *= 2 if seconds <= 0 else max(2, min(10, int(min_time / seconds * 1.2)))
+
+    times = [seconds / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        times.append((time.perf_counter() - start) / loops)
+
+    return {"seconds": min(times), "median": float(np.median(times)), "loops": loops, "repeat": repeat}
+
+
+def run(names: list[str], min_time: float, repeat: int, logging: bool = True) -> dict:
+    results = {}
+    for index, name in enumerate(names):
+        results[name] = time_case(CASES[name](), min_time, repeat)
+        if logging:
+            print(f"[{index + 1}/{len(names)}] {name:<64} {results[name]['seconds'] * 1e6:>12.2f} us", file=sys.stderr)
+    return {"machine": machine(), "created": time.strftime("%Y-%m-%d %H:%M:%S"), "results": results}
+
+
+def baseline_path(name_or_path: str) -> pathlib.Path:
+    """A path to a JSON file, or the name of a baseline in the baselines folder"""
+    path = pathlib.Path(name_or_path)
+    if path.suffix == ".json" or path.exists():
+        return path
+    return BASELINE_FOLDER / f"{name_or_path}.json"
+
+
+def load(name_or_path: str) -> dict:
+    with open(baseline_path(name_or_path)) as file:
+        return json.load(file)
+
+
+def save(report: dict, name_or_path: str) -> pathlib.Path:
+    path = baseline_path(name_or_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(report, file, indent=2)
+    return path
+
+
+def compare(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> dict:
+    """Cases that are more than threshold (as a fraction) slower or faster than baseline, and cases only in one of them"""
+    if threshold < 0:
+        raise ValueError(f"threshold can not be negative, got {threshold}")
+
+    old, new = baseline["results"], current["results"]
+    changes = []
+    for name in old.keys() & new.keys():
+        ratio = new[name]["seconds"] / old[name]["seconds"]
+        changes.append({"name": name, "baseline": old[name]["seconds"], "current": new[name]["seconds"], "ratio": ratio})
+    changes.sort(key=lambda change: change["ratio"], reverse=True)
+
+    return {
+        "slower": [change for change in changes if change["ratio"] > 1 + threshold],
+        "faster": [change for change in changes if change["ratio"] < 1 - threshold],
+        "unchanged": [change for change in changes if 1 - threshold <= change["ratio"] <= 1 + threshold],
+        "missing": sorted(old.keys() - new.keys()),
+        "new": sorted(new.keys() - old.keys()),
+        "machine_differences": {key: (baseline["machine"].get(key), value) for key, value in current["machine"].items() if baseline["machine"].get(key) != value},
+    }
+
+
+def comparison_table(comparison: dict, threshold: float) -> str:
+    lines = []
+    for key, differences in comparison["machine_differences"].items():
+        lines.append(f"warning: {key} was {differences[0]}, now {differences[1]}")
+
+    for title in ("slower", "faster"):
+        if comparison[title]:
+            lines.append(f"{len(comparison[title])} {title} by more than {threshold:.0%}:")
+            lines.append(f"    {'case':<64} {'baseline us':>12} {'current us':>12} {'change':>8}")
+            for change in comparison[title]:
+                lines.append(f"    {change['name']:<64} {change['baseline'] * 1e6:>12.2f} {change['current'] * 1e6:>12.2f} {change['ratio'] - 1:>+8.1%}")
+
+    lines.append(f"{len(comparison['unchanged'])} within {threshold:.0%}")
+    if comparison["missing"]:
+        lines.append(f"not run (only in baseline): {', '.join(comparison['missing'])}")
+    if comparison["new"]:
+        lines.append(f"new (not in baseline): {', '.join(comparison['new'])}")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the neural network and track it against saved baselines")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def timing_arguments(command):
+        command.add_argument("-k", dest="filters", action="append", default=[], help="only run cases with this in their name, can be repeated")
+        command.add_argument("--min-time", type=float, default=0.05, help="seconds each repeat runs a case for at least")
+        command.add_argument("--repeat", type=int, default=5, help="times each case is timed, the fastest is kept")
+
+    run_command = commands.add_parser("run", help="time the cases")
+    timing_arguments(run_command)
+    run_command.add_argument("--save", metavar="NAME_OR_PATH", help="store the results as a baseline")
+    run_command.add_argument("--list", action="store_true", help="only list the cases that would run")
+
+    compare_command = commands.add_parser("compare", help="compare against a baseline, exits with 1 if something got slower")
+    timing_arguments(compare_command)
+    compare_command.add_argument("baseline", help="name of a saved baseline or path to a results file")
+    compare_command.add_argument("current", nargs="?", help="results file to compare, runs the cases now if not given")
+    compare_command.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="fraction slower that counts as a regression")
+    compare_command.add_argument("--save", metavar="NAME_OR_PATH", help="also store the new results")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        names = select(args.filters)
+        if args.list:
+            print("\n".join(names))
+            return
+        report = run(names, args.min_time, args.repeat)
+        if args.save:
+            print(f"Saved {len(names)} results to {save(report, args.save)}", file=sys.stderr)
+        else:
+            print(json.dumps(report, indent=2))
+        return
+
+    baseline = load(args.baseline)
+    if args.current:
+        current = load(args.current)
+    else:
+        current = run(select(args.filters), args.min_time, args.repeat)
+    if args.filters:
+        # cases left out on purpose are not missing
+        baseline["results"] = {name: result for name, result in baseline["results"].items() if all(text in name for text in args.filters)}
+    if args.save:
+        save(current, args.save)
+
+    comparison = compare(baseline, current, args.threshold)
+    print(comparison_table(comparison, args.threshold))
+    sys.exit(1 if comparison["slower"] else 0)
+
+
+if __name__ == "__main__":
+    main()
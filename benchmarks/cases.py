@@ -0,0 +1,282 @@
+"""
+Benchmark cases at the shapes the projects in this repo actually use.
+
+A case is a name and a setup function. Setup makes the data and layers (not timed) and returns the function that is
+timed. Names look like "group/what shape/step" so they can be picked with bench.py -k.
+"""
+
+import inspect
+
+import numpy as np
+
+import neural_network as nn
+from neural_network.activations import activations as activation_module
+from neural_network.losses import losses as loss_module
+
+# (project, n_inputs, n_outputs, batch size, dtype) of the dense layers in the projects
+DENSE_SHAPES = [
+    ("mnist", 784, 256, 16, np.float32),
+    ("mnist", 256, 256, 16, np.float32),
+    ("mnist", 256, 10, 16, np.float32),
+    ("char", 2375, 1024, 16, np.float32),
+    ("char", 1024, 1024, 16, np.float32),
+    ("char", 1024, 95, 16, np.float32),
+    ("pong", 6, 16, 64, np.float64),
+    ("pong", 16, 8, 64, np.float64),
+    ("pong", 8, 1, 64, np.float64),
+    ("dqn", 448, 256, 512, np.float64),
+    ("dqn", 256, 256, 512, np.float64),
+]
+
+# (project, batch shape, dtype) of hidden activations and of network outputs for the losses
+ACTIVATION_SHAPES = [
+    ("mnist", (16, 256), np.float32),
+    ("char", (16, 1024), np.float32),
+    ("pong", (64, 16), np.float64),
+    ("dqn", (512, 256), np.float64),
+]
+
+LOSS_SHAPES = [
+    ("mnist", (16, 10), np.float32),
+    ("char", (16, 95), np.float32),
+    ("pong", (64, 1), np.float64),
+    ("dqn", (512, 1), np.float64),
+]
+
+SINGLE_OUTPUT_LOSSES = (loss_module.MSE, loss_module.BinaryCrossEntropy)
+
+# learning rate for benchmarks that update weights, small so repeating a step thousands of times does not blow up
+LEARNING_RATE = 1e-6
+
+CASES = {}
+
+
+def case(name: str):
+    """Register a setup function under name"""
+    def register(setup):
+        if name in CASES:
+            raise ValueError(f"Benchmark {name} already exists")
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def _classes(module, base) -> list[type]:
+    return [value for value in vars(module).values() if inspect.isclass(value) and issubclass(value, base) and not inspect.isabstract(value)]
+
+
+def _shape_name(shape: tuple) -> str:
+    return "x".join(map(str, shape))
+
+
+def _probabilities(shape: tuple, dtype, rng: np.random.Generator) -> np.ndarray:
+    """Rows that sum to 1 with every value strictly between 0 and 1, like the output of softmax or sigmoid"""
+    values = rng.uniform(0.05, 1, shape)
+    if shape[-1] > 1:
+        values /= values.sum(axis=-1, keepdims=True)
+    return values.astype(dtype)
+
+
+def _dense_cases(project: str, n_inputs: int, n_outputs: int, batch_size: int, dtype) -> None:
+    prefix = f"dense/{project} {n_inputs}x{n_outputs} b{batch_size}"
+
+    def make():
+        rng = np.random.default_rng(0)
+        layer = nn.layers.Dense(n_inputs, n_outputs, dtype=dtype)
+        inputs = rng.standard_normal((batch_size, n_inputs)).astype(dtype)
+        gradient = rng.standard_normal((batch_size, n_outputs)).astype(dtype)
+        return layer, inputs, gradient
+
+    @case(f"{prefix}/forward")
+    def forward():
+        layer, inputs, _ = make()
+        out = np.empty((batch_size, n_outputs), dtype=dtype)
+        return lambda: layer.forward_into(inputs, out)
+
+    @case(f"{prefix}/backward")
+    def backward():
+        layer, inputs, gradient = make()
+        optimizer = nn.optimizers.SGD()
+        out = np.empty((batch_size, n_inputs), dtype=dtype)
+        return lambda: layer.backward_into(inputs, gradient, LEARNING_RATE, optimizer, out)
+
+    @case(f"{prefix}/quantized forward")
+    def quantized_forward():
+        layer, inputs, _ = make()
+        quantized = nn.layers.QuantizedDense.from_dense(layer)
+        out = np.empty((batch_size, n_outputs), dtype=dtype)
+        return lambda: quantized.forward_into(inputs, out)
+
+
+def _sparse_dense_cases(project: str, n_inputs: int, n_outputs: int, picked: int, batch_size: int, dtype) -> None:
+    prefix = f"dense/{project} sparse {n_inputs}x{n_outputs} {picked} picked b{batch_size}"
+
+    def make():
+        rng = np.random.default_rng(0)
+        layer = nn.layers.SparseDense(n_inputs, n_outputs, dtype=dtype)
+        # one pick from each block of inputs, like one hot characters
+        block = n_inputs // picked
+        inputs = np.arange(picked) * block + rng.integers(0, block, (batch_size, picked))
+        gradient = rng.standard_normal((batch_size, n_outputs)).astype(dtype)
+        return layer, inputs, gradient
+
+    @case(f"{prefix}/forward")
+    def forward():
+        layer, inputs, _ = make()
+        out = np.empty((batch_size, n_outputs), dtype=dtype)
+        return lambda: layer.forward_into(inputs, out)
+
+    @case(f"{prefix}/backward")
+    def backward():
+        layer, inputs, gradient = make()
+        optimizer = nn.optimizers.SGD()
+        return lambda: layer.backward_into(inputs, gradient, LEARNING_RATE, optimizer, None)
+
+
+def _activation_cases(activation_class: type, project: str, shape: tuple, dtype) -> None:
+    prefix = f"activation/{activation_class.__name__} {project} {_shape_name(shape)}"
+
+    def make():
+        rng = np.random.default_rng(0)
+        return activation_class(), rng.standard_normal(shape).astype(dtype), rng.standard_normal(shape).astype(dtype)
+
+    @case(f"{prefix}/forward")
+    def forward():
+        activation, inputs, _ = make()
+        out = np.empty(shape, dtype=dtype)
+        return lambda: activation.forward_into(inputs, out)
+
+    @case(f"{prefix}/backward")
+    def backward():
+        activation, inputs, gradient = make()
+        out = np.empty(shape, dtype=dtype)
+        return lambda: activation.backward_into(inputs, gradient, None, None, out)
+
+
+def _loss_cases(loss_class: type, project: str, shape: tuple, dtype) -> None:
+    prefix = f"loss/{loss_class.__name__} {project} {_shape_name(shape)}"
+
+    def make():
+        rng = np.random.default_rng(0)
+        y_pred = _probabilities(shape, dtype, rng)
+        labels = rng.integers(0, shape[-1], shape[0])
+        if issubclass(loss_class, loss_module.SparseLoss):
+            y_true = labels
+        elif shape[-1] == 1:
+            y_true = rng.integers(0, 2, shape).astype(dtype)
+        else:
+            y_true = np.eye(shape[-1], dtype=dtype)[labels]
+        return loss_class(), y_true, y_pred
+
+    @case(f"{prefix}/forward")
+    def forward():
+        loss, y_true, y_pred = make()
+        return lambda: loss.forward(y_true, y_pred)
+
+    @case(f"{prefix}/backward")
+    def backward():
+        loss, y_true, y_pred = make()
+        return lambda: loss.backward(y_true, y_pred)
+
+
+def _network(project: str) -> tuple[nn.network.Network, tuple, int, int]:
+    """A network like the one in project, with (input shape, outputs, batch size)"""
+    layers, activations, losses = nn.layers, nn.activations, nn.losses
+
+    if project == "mnist":
+        return nn.network.Network([
+            layers.Dense(784, 256), activations.ReLU(),
+            layers.Dense(256, 256), activations.ReLU(),
+            layers.Dense(256, 256), activations.ReLU(),
+            layers.Dense(256, 10), activations.Softmax(),
+        ], loss=losses.CategoricalCrossEntropy(categorical_labels=True), dtype=np.float32), (784,), 10, 16
+    if project == "char":
+        return nn.network.Network([
+            layers.Dense(2375, 1024), activations.ReLU(),
+            layers.Dense(1024, 1024), activations.ReLU(),
+            layers.Dense(1024, 1024), activations.ReLU(),
+            layers.Dense(1024, 1024), activations.ReLU(),
+            layers.Dense(1024, 95), activations.Softmax(),
+        ], loss=losses.CategoricalCrossEntropy(categorical_labels=True), dtype=np.float32), (2375,), 95, 16
+    if project == "pong":
+        return nn.network.Network([
+            layers.Dense(6, 16), activations.Tanh(),
+            layers.Dense(16, 8), activations.Tanh(),
+            layers.Dense(8, 1),
+        ], loss=losses.MSE()), (6,), 1, 64
+    if project == "dqn":
+        return nn.network.Network([
+            layers.Dense(448, 256), activations.ReLU(),
+            layers.Dense(256, 256), activations.ReLU(),
+            layers.Dense(256, 256), activations.ReLU(),
+            layers.Dense(256, 1), activations.Linear(),
+        ], loss=losses.MSE()), (448,), 1, 512
+    raise ValueError(f"Unknown project {project}")
+
+
+def _network_cases(project: str, batches: int) -> None:
+    def make():
+        rng = np.random.default_rng(0)
+        network, input_shape, outputs, batch_size = _network(project)
+        samples = batches * batch_size
+        x = rng.standard_normal((samples, *input_shape)).astype(network.dtype)
+        if outputs > 1:
+            y = rng.integers(0, outputs, samples)
+        else:
+            y = rng.standard_normal((samples, 1)).astype(network.dtype)
+        return network, x, y, outputs, batch_size
+
+    @case(f"network/{project} {batches} batches/train")
+    def train():
+        network, x, y, _, batch_size = make()
+        optimizer = nn.optimizers.SGD()
+        return lambda: network.train(x, y, learning_rate=LEARNING_RATE, batch_size=batch_size, logging=False, optimizer=optimizer)
+
+    @case(f"network/{project} {batches} batches/predict")
+    def predict():
+        network, x, _, outputs, batch_size = make()
+        out = np.empty((len(x), outputs), dtype=network.dtype)
+        return lambda: network.predict(x, batch_size=batch_size, out=out)
+
+
+def _generator_cases(batch_size: int, top_k: int) -> None:
+    def make():
+        # the character network as it is trained, with the sparse first layer the generator needs
+        network = nn.network.Network([
+            nn.layers.SparseDense(2375, 1024), nn.activations.ReLU(),
+            nn.layers.Dense(1024, 1024), nn.activations.ReLU(),
+            nn.layers.Dense(1024, 1024), nn.activations.ReLU(),
+            nn.layers.Dense(1024, 1024), nn.activations.ReLU(),
+            nn.layers.Dense(1024, 95), nn.activations.Softmax(),
+        ], loss=nn.losses.SparseCategoricalCrossEntropy(), dtype=np.float32)
+        generator = nn.network.SlidingWindowGenerator(network, 25, 95)
+        generator.reset([np.arange(25) % 95] * batch_size)
+        return generator
+
+    @case(f"generate/char {batch_size} sequences top {top_k}/step")
+    def step():
+        generator = make()
+        rng = np.random.default_rng(0)
+        return lambda: generator.push(nn.network.sample_tokens(generator.probabilities(), top_k, rng=rng))
+
+
+for shape in DENSE_SHAPES:
+    _dense_cases(*shape)
+
+_sparse_dense_cases("char", 2375, 1024, 25, 16, np.float32)
+
+for activation_class in _classes(activation_module, activation_module.Activation):
+    for shape in ACTIVATION_SHAPES:
+        _activation_cases(activation_class, *shape)
+
+for loss_class in _classes(loss_module, loss_module.Loss):
+    for project, shape, dtype in LOSS_SHAPES:
+        # picking one class out of one output makes no sense, so single outputs are only for regression and yes or no
+        if shape[-1] > 1 or loss_class in SINGLE_OUTPUT_LOSSES:
+            _loss_cases(loss_class, project, shape, dtype)
+
+for project, batches in (("mnist", 32), ("char", 8), ("pong", 32), ("dqn", 4)):
+    _network_cases(project, batches)
+
+for batch_size in (1, 32):
+    _generator_cases(batch_size, 2)
@@ -15,6 +15,9 @@ CHOOSE_N_CANDIDATES_FROM_TOP = 2
 # If False, all caudates are treated equally
 USE_PROBABILITIES = True
 
+# How many different continuations to make of each message, they are all made at once so a few take about as long as one
+NUMBER_OF_COMPLETIONS = 1
+
 # todo, let user choose
 
 # Path to saved network weights and biases. You do not need to include file extension
@@ -42,24 +45,27 @@ def main() -> None:
         print(f"Choose next character based on random choice from top {CHOOSE_N_CANDIDATES_FROM_TOP}", "with probabilities." if USE_PROBABILITIES else "")
     print()    
 
+    # only runs the network on the newest char each step, instead of the whole window again
+    generator = nn.network.SlidingWindowGenerator(network, MAX_CHARS_IN_DATA, NUMBER_OF_CHARS_IN_RANGE)
+    # an infinite temperature makes every candidate as likely
+    temperature = 1.0 if USE_PROBABILITIES else np.inf
+
     while True:
         message = input("CharGPN> ")
 
-        print(message, end="", flush=True)
-
-        while not TERMINATION_LAMBDA(message):
-            output = network.compute(format_one_hot_messages(message_to_one_hot(message)))[0]
-
-            top_indices = np.argsort(output)[-(CHOOSE_N_CANDIDATES_FROM_TOP if CHOOSE_N_CANDIDATES_FROM_TOP is not None else len(output)):]
-            top_probabilities = output[top_indices]
-            normalized_probabilities = top_probabilities / top_probabilities.sum()
-            selected = np.random.choice(top_indices, p=normalized_probabilities)
-
-            char = num_to_lower_char(selected)
-            print(char, end="", flush=True)
+        completions = [message] * NUMBER_OF_COMPLETIONS
+        streaming = NUMBER_OF_COMPLETIONS == 1
+        if streaming:
+            print(message, end="", flush=True)
 
-            message += char
+        for chars in continue_messages(generator, completions, TERMINATION_LAMBDA, CHOOSE_N_CANDIDATES_FROM_TOP, temperature):
+            for index, char in chars:
+                completions[index] += char
+                if streaming:
+                    print(char, end="", flush=True)
 
+        if not streaming:
+            print("\n\n".join(completions), end="")
         print("\n")
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 import pathlib, sys
+import typing
 import unicodedata
 
 import numpy as np
@@ -17,6 +18,8 @@ NUMBER_OF_CHARS_IN_RANGE = MAX_CHAR - MIN_CHAR + 1
 
 MAX_CHARS_IN_DATA = 25
 
+NETWORK_DTYPE = np.float32
+
 def char_to_num(char: str) -> int:
     n = ord(char)
     if char in TERMINATION_CHARS:
@@ -34,23 +37,55 @@ def normalize(message: str) -> str:
     nfkd_form = unicodedata.normalize('NFKD', message)
     return u"".join([c for c in nfkd_form if not unicodedata.combining(c)])
 
-def to_one_hot_vector(nums, n_labels: int) -> np.ndarray:
-    return np.eye(n_labels)[nums]
-
-def message_to_one_hot(message: str) -> np.ndarray:
-    return to_one_hot_vector([char_to_num(char) for char in message], NUMBER_OF_CHARS_IN_RANGE)
-
-def format_one_hot_messages(data: np.ndarray) -> np.ndarray:
-    data = data[-MAX_CHARS_IN_DATA:]
-    padding = np.zeros([MAX_CHARS_IN_DATA - len(data), NUMBER_OF_CHARS_IN_RANGE]).flatten()
-    return np.hstack([padding, data.flatten()])
+def message_to_nums(message: str) -> np.ndarray:
+    return np.array([char_to_num(char) for char in message], dtype=np.intp)
+
+def format_message_indexes(nums: np.ndarray) -> np.ndarray:
+    """
+    Network input for the last MAX_CHARS_IN_DATA chars, the index of the one in the one hot vector of every char.
+    Short messages are padded at the start with -1, which means no char.
+    """
+    nums = nums[-MAX_CHARS_IN_DATA:]
+    positions = np.arange(MAX_CHARS_IN_DATA - len(nums), MAX_CHARS_IN_DATA)
+    indexes = np.full(MAX_CHARS_IN_DATA, -1, dtype=np.intp)
+    indexes[positions] = positions * NUMBER_OF_CHARS_IN_RANGE + nums
+    return indexes
+
+def continue_messages(generator, messages: list[str], is_done: typing.Callable[[str], bool], top_k: int = None,
+                      temperature: float = 1.0, max_new_chars: int = None, rng=None) -> typing.Iterator[list[tuple[int, str]]]:
+    """
+    Continue all messages at once with generator (a SlidingWindowGenerator), one char each step, until is_done is true
+    for every message or max_new_chars were added. Each step yields the (message index, char) of the messages that got
+    a char, finished messages are masked out so they stop changing while the rest go on.
+    rng goes to sample_tokens, with a Generator for each message they come out the same as continuing them one at a time.
+    """
+    messages = list(messages)
+    generator.reset([message_to_nums(message) for message in messages])
+    active = np.array([not is_done(message) for message in messages], dtype=bool)
+
+    steps = 0
+    while active.any() and (max_new_chars is None or steps < max_new_chars):
+        selected = nn.network.sample_tokens(generator.probabilities(), top_k, temperature, rng)
+
+        chars = []
+        for index in np.flatnonzero(active):
+            char = num_to_lower_char(selected[index])
+            messages[index] += char
+            active[index] = not is_done(messages[index])
+            chars.append((index, char))
+
+        # messages that just finished are never read again, so they do not need the new char pushed
+        generator.push(selected, active)
+        steps += 1
+        yield chars
 
 NETWORK_INPUT_LAYER_SIZE = NUMBER_OF_CHARS_IN_RANGE * MAX_CHARS_IN_DATA
 NETWORK_HIDDEN_LAYER_SIZE = 2**10
 NETWORK_OUTPUT_LAYER_SIZE = NUMBER_OF_CHARS_IN_RANGE
 
+# the input is MAX_CHARS_IN_DATA one hot chars, given as the indexes of their ones (see format_message_indexes)
 network = nn.network.Network([
-    nn.layers.Dense(NETWORK_INPUT_LAYER_SIZE, NETWORK_HIDDEN_LAYER_SIZE),
+    nn.layers.SparseDense(NETWORK_INPUT_LAYER_SIZE, NETWORK_HIDDEN_LAYER_SIZE),
     nn.activations.ReLU(),
     
     nn.layers.Dense(NETWORK_HIDDEN_LAYER_SIZE, NETWORK_HIDDEN_LAYER_SIZE),
@@ -64,4 +99,4 @@ network = nn.network.Network([
     
     nn.layers.Dense(NETWORK_HIDDEN_LAYER_SIZE, NUMBER_OF_CHARS_IN_RANGE),
     nn.activations.Softmax(),    
-], loss=nn.losses.CategoricalCrossEntropy())
\ No newline at end of file
+], loss=nn.losses.SparseCategoricalCrossEntropy(), dtype=NETWORK_DTYPE)
\ No newline at end of file
@@ -12,30 +12,22 @@ network.load(str(NETWORK_PATH))
 
 print(f"Loaded network from {NETWORK_PATH}")
 
+# only runs the network on the newest char each step, instead of the whole window again
+generator = nn.network.SlidingWindowGenerator(network, MAX_CHARS_IN_DATA, NUMBER_OF_CHARS_IN_RANGE)
+
 def predict_next_character_probs(message, n = 7):
-    output = network.compute(format_one_hot_messages(message_to_one_hot(message)))[0]
+    generator.reset([message_to_nums(message)])
+    output = generator.probabilities()[0]
     top_indices = np.argsort(output)[:-n-1:-1]
     top_probabilities = output[top_indices]
     normalized_probabilities = top_probabilities / top_probabilities.sum()
     return top_indices, normalized_probabilities
 
 def predict_next_word(message, max_len = 24):
-
+    is_word_done = lambda text: len(text) > len(message) and text[-1].isspace()
     word = ""
-
-    while (word == "" or not word[-1].isspace()) and len(word) < max_len:
-
-        output = network.compute(format_one_hot_messages(message_to_one_hot(message + word)))[0]
-
-        top_indices = np.argsort(output)[-CHOOSE_N_CANDIDATES_FROM_TOP:]
-        top_probabilities = output[top_indices]
-        normalized_probabilities = top_probabilities / top_probabilities.sum()
-        selected = np.random.choice(top_indices, p=normalized_probabilities)
-
-        char = num_to_lower_char(selected)
-
-        word += char
-
+    for chars in continue_messages(generator, [message], is_word_done, CHOOSE_N_CANDIDATES_FROM_TOP, max_new_chars=max_len):
+        word += "".join(char for _, char in chars)
     return word
 
 # Tkinter application setup
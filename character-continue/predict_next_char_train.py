@@ -14,6 +14,7 @@ BATCH_SIZE = 16
 LEARNING_RATE = 0.0075
 
 OUTPUT_FOLDER = directory / "looped-train"
+CHECKPOINT_FOLDER = OUTPUT_FOLDER / "checkpoints"
 TRAINING_DATA_PATH = directory / "data" / "dataset" / "data.txt"
 
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
@@ -31,34 +32,66 @@ with open(TRAINING_DATA_PATH, "r", encoding="utf-8") as file:
     
 print("Formatting Data...")
 
-computer_readable_messages = [message_to_one_hot(message) for message in messages]
+computer_readable_messages = [message_to_nums(message) for message in messages]
 
-X_train = np.empty(shape=(len(computer_readable_messages) * DATA_POINTS_PER_MESSAGE, NETWORK_INPUT_LAYER_SIZE))
-y_train = np.empty(shape=(len(computer_readable_messages) * DATA_POINTS_PER_MESSAGE, NETWORK_OUTPUT_LAYER_SIZE))
+N_DATA_POINTS = len(computer_readable_messages) * DATA_POINTS_PER_MESSAGE
+N_BATCHES = -(-N_DATA_POINTS // BATCH_SIZE)
 
-print(f"""
-        Using {len(computer_readable_messages):,} messages to create {len(X_train):,} data points to train on, repeated {EPOCHS:,} times.
-        That is {X_train.nbytes // 2**20:,} MB of data.
+# batches are made on the prefetch thread, so they get their own random generator that checkpoints can save exactly
+batch_random = np.random.default_rng()
+
+def training_batches():
+    """Makes training data one batch at a time while training, so the full data set is never in memory"""
+    message_order = batch_random.permutation(N_DATA_POINTS) // DATA_POINTS_PER_MESSAGE
+
+    for start in range(0, N_DATA_POINTS, BATCH_SIZE):
+        batch_messages = message_order[start:start + BATCH_SIZE]
+
+        X_batch = np.empty(shape=(len(batch_messages), MAX_CHARS_IN_DATA), dtype=np.intp)
+        y_batch = np.empty(shape=(len(batch_messages),), dtype=np.intp)
+
+        for batch_index, message_index in enumerate(batch_messages):
+            message = computer_readable_messages[message_index]
+
+            rand_index = batch_random.integers(MIN_MESSAGE_SIZE - 1, len(message) - 1)
+
+            X_batch[batch_index] = format_message_indexes(message[:rand_index])
+            y_batch[batch_index] = message[rand_index]
+
+        yield X_batch, y_batch
+
+# started with python -m neural_network.distributed.launch --nproc N this trains on N processes, each making its own batches
+group = nn.distributed.ProcessGroup.from_environment()
+STEPS_PER_RANK = -(-N_BATCHES // group.world_size)
+
+if group.rank == 0:
+    print(f"""
+        Using {len(computer_readable_messages):,} messages to create {N_DATA_POINTS:,} data points to train on, repeated {EPOCHS:,} times.
+        Data is made as it is needed, {N_BATCHES:,} batches per epoch split over {group.world_size} processes.
         Training happens in batches of {BATCH_SIZE} with a learning rate of {LEARNING_RATE:%}.
     """)
 
-print("Training in loop...")
-print("Stop at any round and view result")
-print()
+    print("Training in loop...")
+    print("Stop at any round and view result")
+    print()
+
+# every process keeps its own checkpoints since each has its own random state for making batches
+checkpoints = nn.network.CheckpointManager(CHECKPOINT_FOLDER, network, keep=2, prefix=f"rank{group.rank}", generators={"batches": batch_random})
+resumed = checkpoints.restore()
+first_round = 0 if resumed is None else resumed["step"] + 1
 
-for i in range(100):
-    print(f"Round {i:,}. Beginning at {time.ctime(time.time())}")
+if resumed is not None and group.rank == 0:
+    print(f"Resuming at round {first_round:,} from {checkpoints.latest()}")
 
-    for message_index, message in enumerate(computer_readable_messages):
-        for place_index in range(DATA_POINTS_PER_MESSAGE):
-            train_index = message_index * DATA_POINTS_PER_MESSAGE + place_index
-            
-            rand_index = np.random.randint(MIN_MESSAGE_SIZE - 1, len(message) - 1)
-            
-            X_train[train_index] = format_one_hot_messages(message[:rand_index])
-            y_train[train_index] = message[rand_index]
+with nn.distributed.DistributedDataParallel(network, group), checkpoints:
+    for i in range(first_round, 100):
+        if group.rank == 0:
+            print(f"Round {i:,}. Beginning at {time.ctime(time.time())}")
 
-    network.train(X_train, y_train, batch_size=BATCH_SIZE, epochs=EPOCHS, learning_rate=LEARNING_RATE)
+        network.train_stream(training_batches, steps=STEPS_PER_RANK, epochs=EPOCHS, learning_rate=LEARNING_RATE, logging=group.rank == 0, prefetch=8)
 
-    network.dump(str(OUTPUT_FOLDER / f"char-network-v{i}"))
-    print()
+        checkpoints.save(i)
+
+        if group.rank == 0:
+            network.dump(str(OUTPUT_FOLDER / f"char-network-v{i}"))
+            print()
@@ -1,8 +1,15 @@
+import pathlib
 import pickle
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).parent.absolute().parent))
+
+import neural_network as nn
 
 small_drawing_width, small_drawing_height = (28, 28)
 
-save_file_name = "mnist_train_test.pkl"
+save_file_name = "mnist_train_test.nnd"
+old_save_file_name = "mnist_train_test.pkl"
 
 def save(directory, log = False):
     from keras.datasets.mnist import load_data
@@ -15,22 +22,29 @@ def save(directory, log = False):
         print(X_test.dtype, X_test.shape)
         print(y_test.dtype, y_test.shape)
 
-    data = ((X_train.shape[0], X_train.tobytes(), y_train.tobytes()), (X_test.shape[0], X_test.tobytes(), y_test.tobytes()))
+    nn.data.save_arrays(directory / save_file_name, {"X_train": X_train, "y_train": y_train, "X_test": X_test, "y_test": y_test})
 
-    with open(directory / save_file_name, "wb") as file:
-        pickle.dump(data, file)
-        
-def load(directory, log = False):
+def convert_old_save(directory) -> None:
+    """Rewrite the old pickled data file in the memory mapped format"""
     import numpy as np
     
-    with open(directory / save_file_name, "rb") as file:
+    with open(directory / old_save_file_name, "rb") as file:
         ((train_len, X_train, y_train), (test_len, X_test, y_test)) = pickle.load(file)
         
-    X_train = np.frombuffer(X_train, dtype=np.uint8).reshape((train_len, small_drawing_height, small_drawing_width))
-    y_train = np.frombuffer(y_train, dtype=np.uint8).reshape((train_len,))
+    nn.data.save_arrays(directory / save_file_name, {
+        "X_train": np.frombuffer(X_train, dtype=np.uint8).reshape((train_len, small_drawing_height, small_drawing_width)),
+        "y_train": np.frombuffer(y_train, dtype=np.uint8).reshape((train_len,)),
+        "X_test": np.frombuffer(X_test, dtype=np.uint8).reshape((test_len, small_drawing_height, small_drawing_width)),
+        "y_test": np.frombuffer(y_test, dtype=np.uint8).reshape((test_len,)),
+    })
+        
+def load(directory, log = False):
+    """Data is memory mapped, so only what is used gets read from disk"""
+    if not (directory / save_file_name).exists() and (directory / old_save_file_name).exists():
+        convert_old_save(directory)
     
-    X_test = np.frombuffer(X_test, dtype=np.uint8).reshape((test_len, small_drawing_height, small_drawing_width))
-    y_test = np.frombuffer(y_test, dtype=np.uint8).reshape((test_len,))
+    arrays, _ = nn.data.load_arrays(directory / save_file_name)
+    X_train, y_train, X_test, y_test = arrays["X_train"], arrays["y_train"], arrays["X_test"], arrays["y_test"]
     
     if log:
         print(X_train.dtype, X_train.shape)
@@ -38,4 +52,4 @@ def load(directory, log = False):
         print(X_test.dtype, X_test.shape)
         print(y_test.dtype, y_test.shape)
     
-    return (X_train, y_train), (X_test, y_test)
\ No newline at end of file
+    return (X_train, y_train), (X_test, y_test)
@@ -3,18 +3,14 @@ print("Loading modules...")
 import pathlib
 import sys
 
-from matplotlib.pylab import f
-
 directory = pathlib.Path(__file__).parent.absolute()
 sys.path.append(str(directory.parent))
 
 import tkinter as tk
 
 import numpy as np
-from matplotlib import pyplot as plt
 
 import neural_network as nn
-import data_saver
 
 # --- get data and set constants ---
 
@@ -67,7 +63,7 @@ def apply_all(arrays: np.ndarray, func, shape) -> np.ndarray:
     raise ValueError(f"Invalid number of dimensions: {arrays.ndim}")
 
 def preprocess(inputs):
-    inputs = inputs.astype(np.float64) / 255
+    inputs = inputs.astype(np.float32) / 255
 
     inputs = apply_all(inputs, lambda x: interpolate_2d(pad_to_square_2d(trim_zeros_2d(x)), (small_drawing_height, small_drawing_width)), (inputs.shape[0], small_drawing_width, small_drawing_height))
 
@@ -88,37 +84,50 @@ network = nn.network.Network([
     nn.layers.Dense(layer_size, n_outputs),
     nn.activations.Softmax(),
 
-], loss=nn.losses.CategoricalCrossEntropy(categorical_labels=True), preprocess=[preprocess])
+], loss=nn.losses.CategoricalCrossEntropy(categorical_labels=True), preprocess=[preprocess], dtype=np.float32)
 
 save_file = str(directory / "mnist-network")
-try:
-    print(f"Attempting to load saved network from {save_file}...")
-    network.load(save_file)
-except FileNotFoundError:
-    print("No saved network found, getting training data")
-    
-    (X_train, y_train), (X_test, y_test) = data_saver.load(directory)
-     
-    print("Starting Training...")
-    network.train(X_train, y_train, batch_size=16, epochs=2, learning_rate=0.1)
-    network.dump(save_file)
-
-    # --- test model on test data ---
+_network_loaded = False
 
-    # print("\nDisplaying tests...")
-    # for num in range(0, n_outputs):
-    #     index = np.random.choice(np.where(y_test == num)[0])
-    #     output = test_output[index]
-    #     guess = output.argmax()
+def get_network() -> nn.network.Network:
+    """Network with its saved weights, loaded the first time it is needed (or trained if there is no save)"""
+    global _network_loaded
+    if _network_loaded:
+        return network
 
-    #     print(f"y_pred={output.tolist()}, y_true={np.eye(n_outputs)[guess]}")
+    try:
+        print(f"Attempting to load saved network from {save_file}...")
+        network.load(save_file)
+    except FileNotFoundError:
+        import data_saver
 
-    #     plt.title(
-    #         f"Test Data Example {num}:\n{guess=}, confidence={output[guess]:.2%}, correct={guess==num}")
-    #     plt.imshow(X_test[index], cmap="Greys")
-    #     plt.show()
-else:
-    print("Loaded saved network.")
+        print("No saved network found, getting training data")
+        
+        (X_train, y_train), (X_test, y_test) = data_saver.load(directory)
+         
+        print("Starting Training...")
+        network.train(X_train, y_train, batch_size=16, epochs=2, learning_rate=0.1, prefetch=8)
+        network.dump(save_file)
+
+        # --- test model on test data ---
+
+        # print("\nDisplaying tests...")
+        # for num in range(0, n_outputs):
+        #     index = np.random.choice(np.where(y_test == num)[0])
+        #     output = test_output[index]
+        #     guess = output.argmax()
+
+        #     print(f"y_pred={output.tolist()}, y_true={np.eye(n_outputs)[guess]}")
+
+        #     plt.title(
+        #         f"Test Data Example {num}:\n{guess=}, confidence={output[guess]:.2%}, correct={guess==num}")
+        #     plt.imshow(X_test[index], cmap="Greys")
+        #     plt.show()
+    else:
+        print("Loaded saved network.")
+    
+    _network_loaded = True
+    return network
 
 # --- create drawing GUI ---
 
@@ -251,10 +260,12 @@ class DrawingDisplay:
         self.on_reset()
 
     def show_graph(self) -> None:
+        from matplotlib import pyplot as plt
         plt.imshow(self.pixel_array, cmap="Greys")
         plt.show()
         
     def show_processed_graph(self) -> None:
+        from matplotlib import pyplot as plt
         plt.imshow(preprocess(self.pixel_array), cmap="Greys")
         plt.show()
 
@@ -377,7 +388,7 @@ def main():
 
     def update(pixels: np.ndarray):
         # do neural network stuff here
-        output = network.compute(np.array([pixels]))[0]
+        output = get_network().compute(np.array([pixels]))[0]
 
         # print(", ".join(f"{num}: {chance:.5%}" for num, chance in enumerate(output)))
         
@@ -391,6 +402,9 @@ def main():
 
     reset()
 
+    # load after the window is first drawn, so it shows up right away
+    root.after_idle(get_network)
+
     print("\nDisplaying drawing demo.")
     root.mainloop()
 
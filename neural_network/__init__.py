@@ -1,3 +1,18 @@
-from neural_network import activations, layers, losses, network
+import importlib
 
-__all__ = [activations, layers, losses, network]
+# submodules are imported the first time they are used, so importing neural_network (or only part of it) stays fast
+_SUBMODULES = ("activations", "data", "distributed", "layers", "losses", "network", "optimizers")
+
+__all__ = list(_SUBMODULES)
+
+
+def __getattr__(name: str):
+    if name in _SUBMODULES:
+        module = importlib.import_module(f"{__name__}.{name}")
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_SUBMODULES))
@@ -1,3 +1,4 @@
+import math
 from abc import ABC, abstractmethod
 
 import numpy as np
@@ -5,7 +6,15 @@ import numpy as np
 from neural_network.base import BaseLayer
 
 
+def _float_dtype(x: np.ndarray) -> np.dtype:
+    """Keeps float32 inputs as float32, anything else (like ints) becomes float64"""
+    return np.result_type(x.dtype, np.float32)
+
+
 class Activation(BaseLayer, ABC):
+    # rough operations per element for (forward, backward), functions like exp are counted as one
+    _flops_per_element = (1, 2)
+
     def __call__(self, x: np.ndarray) -> np.ndarray:
         return self.activation(x)
 
@@ -15,9 +24,23 @@ class Activation(BaseLayer, ABC):
     def forward(self, inputs):
         return self.activation(inputs)
 
-    def backward(self, inputs, output_gradient, learning_rate=None):
+    def backward(self, inputs, output_gradient, learning_rate=None, optimizer=None):
         return output_gradient * self.activation_prime(inputs)
 
+    def backward_into(self, inputs, output_gradient, learning_rate, optimizer, out):
+        if out is None:
+            return self.backward(inputs, output_gradient, learning_rate, optimizer)
+        return np.multiply(output_gradient, self.activation_prime(inputs), out=out)
+
+    def flops(self, input_shape, input_gradient=True):
+        elements = int(np.prod(input_shape))
+        forward, backward = self._flops_per_element
+        return forward * elements, backward * elements
+
+    def backward_from_output(self, outputs: np.ndarray, output_gradient: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """Backward using the cached forward output instead of the input, callers check _prime_from_output first"""
+        return np.multiply(output_gradient, self.activation_prime_from_output(outputs), out=out)
+
     @abstractmethod
     def activation(self, x: np.ndarray) -> np.ndarray:
         pass
@@ -32,16 +55,20 @@ class BinaryStep(Activation):
     Cons: Only works for binary outputs, bad for back prop because gradient is always 0.
     """
     _verbose_name = "binary step"
+    _prime_from_output = True
 
     def __init__(self, threshold=0.0):
         super().__init__()
         self.threshold = threshold
 
     def activation(self, x):
-        return np.where(x < self.threshold, 0.0, 1.0)
+        return np.where(x < self.threshold, 0.0, 1.0).astype(_float_dtype(x), copy=False)
 
     def activation_prime(self, x):
-        return np.zeros_like(x, dtype=float)
+        return np.zeros_like(x, dtype=_float_dtype(x))
+
+    def activation_prime_from_output(self, y):
+        return np.zeros_like(y)
 
 
 class Sigmoid(Activation):
@@ -53,17 +80,22 @@ class Sigmoid(Activation):
     Cons: Little change in output from values ~3 or more from zero.
     """
     _verbose_name = "logistic activation function"
+    _prime_from_output = True
 
     def __init__(self):
         super().__init__()
 
     def activation(self, x):
         # return 1.0 / (1.0 + np.exp(-x))
-        return np.where(x < 0, np.exp(x) / (1.0 + np.exp(x)), 1.0 / (1.0 + np.exp(-x)))
+        # exp of only negative numbers so it never overflows, then pick the matching form for each sign
+        e_x = np.exp(-np.abs(x))
+        return np.where(x < 0, e_x, 1.0) / (1.0 + e_x)
 
-    def activation_prime(self, output_gradient):
-        s = self(output_gradient)
-        return s * (1.0-s)
+    def activation_prime(self, x):
+        return self.activation_prime_from_output(self(x))
+
+    def activation_prime_from_output(self, y):
+        return y * (1.0 - y)
 
 
 class HardSigmoid(Activation):
@@ -81,7 +113,7 @@ class HardSigmoid(Activation):
         return np.clip(x, 0.0, 1.0)
 
     def activation_prime(self, x):
-        return np.where((x >= -2.5) & (x <= 2.5), 0.2, 0.0)
+        return np.where((x >= -2.5) & (x <= 2.5), 0.2, 0.0).astype(_float_dtype(x), copy=False)
 
 
 class Tanh(Activation):
@@ -93,6 +125,7 @@ class Tanh(Activation):
     Cons: Same problem as sigmoid, little change in values ~3 or more from zero.
     """
     _verbose_name = "hyperbolic tangent"
+    _prime_from_output = True
 
     def __init__(self):
         super().__init__()
@@ -100,8 +133,14 @@ class Tanh(Activation):
     def activation(self, x):
         return np.tanh(x)
 
+    def forward_into(self, inputs, out):
+        return np.tanh(inputs, out=out)
+
     def activation_prime(self, x):
-        return 1 - np.tanh(x) ** 2
+        return self.activation_prime_from_output(np.tanh(x))
+
+    def activation_prime_from_output(self, y):
+        return 1 - y ** 2
 
 
 class Affine(Activation):
@@ -110,6 +149,7 @@ class Affine(Activation):
     Just y = mx + b
     """
     _verbose_name = "affine"
+    _prime_from_output = True
 
     def __init__(self, slope=1, intercept=0):
         super().__init__()
@@ -120,7 +160,10 @@ class Affine(Activation):
         return self.slope * x + self.intercept
 
     def activation_prime(self, x):
-        return np.ones_like(x, dtype=float) * self.slope
+        return np.full_like(x, self.slope, dtype=_float_dtype(x))
+
+    def activation_prime_from_output(self, y):
+        return np.full_like(y, self.slope)
 
 
 class Linear(Activation):
@@ -129,6 +172,7 @@ class Linear(Activation):
     Cons: All layers will just become basically one layer, bad for back prop because gradient is always 1.
     """
     _verbose_name = "linear"
+    _prime_from_output = True
 
     def __init__(self):
         super().__init__()
@@ -136,12 +180,26 @@ class Linear(Activation):
     def activation(self, x):
         return x
 
+    def forward_into(self, inputs, out):
+        np.copyto(out, inputs)
+        return out
+
     def activation_prime(self, x):
-        return np.ones_like(x, dtype=float)
+        return np.ones_like(x, dtype=_float_dtype(x))
+
+    def activation_prime_from_output(self, y):
+        return np.ones_like(y)
+
+    def backward_from_output(self, outputs, output_gradient, out=None):
+        if out is None:
+            return output_gradient
+        np.copyto(out, output_gradient)
+        return out
 
 
 class Exponential(Activation):
     _verbose_name = "Exponential"
+    _prime_from_output = True
 
     def __init__(self):
         super().__init__()
@@ -149,9 +207,15 @@ class Exponential(Activation):
     def activation(self, x):
         return np.exp(x)
 
+    def forward_into(self, inputs, out):
+        return np.exp(inputs, out=out)
+
     def activation_prime(self, x):
         return np.exp(x)
 
+    def activation_prime_from_output(self, y):
+        return y
+
 
 class ReLU(Activation):
     """
@@ -161,6 +225,7 @@ class ReLU(Activation):
     Cons: Can make "dead" neurons that don't have their weights and biases updated and that never get activated, also since it sets all negative to zero it loses some training data
     """
     _verbose_name = "rectified linear unit"
+    _prime_from_output = True
 
     def __init__(self):
         super().__init__()
@@ -168,8 +233,19 @@ class ReLU(Activation):
     def activation(self, x):
         return np.maximum(x, 0.0)
 
+    def forward_into(self, inputs, out):
+        return np.maximum(inputs, 0.0, out=out)
+
     def activation_prime(self, x):
-        return (x > 0).astype(float)
+        return (x > 0).astype(_float_dtype(x))
+
+    def activation_prime_from_output(self, y):
+        return (y > 0).astype(y.dtype)
+
+    def backward_from_output(self, outputs, output_gradient, out=None):
+        if out is None:
+            out = np.empty_like(output_gradient)
+        return np.multiply(output_gradient, outputs > 0, out=out)
 
 
 class LeakyReLU(Activation):
@@ -188,7 +264,15 @@ class LeakyReLU(Activation):
         return np.where(x > 0, x, x * self.alpha)
 
     def activation_prime(self, x):
-        return np.where(x > 0, 1.0, self.alpha)
+        return np.where(x > 0, 1.0, self.alpha).astype(_float_dtype(x), copy=False)
+
+    @property
+    def _prime_from_output(self):
+        # with a negative alpha, negative inputs give positive outputs so the sign does not match anymore
+        return self.alpha >= 0
+
+    def activation_prime_from_output(self, y):
+        return np.where(y > 0, 1.0, self.alpha).astype(y.dtype, copy=False)
 
 
 class ELU(Activation):
@@ -209,6 +293,14 @@ class ELU(Activation):
     def activation_prime(self, x):
         return np.where(x > 0, 1.0, self.alpha * np.exp(x))
 
+    @property
+    def _prime_from_output(self):
+        return self.alpha > 0
+
+    def activation_prime_from_output(self, y):
+        # for negative inputs y = alpha * (e^x - 1), so alpha * e^x = y + alpha
+        return np.where(y > 0, 1.0, y + self.alpha)
+
 
 class GELU(Activation):
     """
@@ -223,12 +315,12 @@ class GELU(Activation):
         # self.approximate = approximate
 
     def activation(self, x):
-        return 0.5 * x * (1 + np.tanh(np.sqrt(2 / np.pi) * (x + 0.044715 * x ** 3)))
+        return 0.5 * x * (1 + np.tanh(math.sqrt(2 / math.pi) * (x + 0.044715 * x ** 3)))
 
     def activation_prime(self, x):
-        erf_prime = (2 / np.sqrt(np.pi)) * np.exp(-((x / np.sqrt(2)) ** 2))
-        approx = np.tanh(np.sqrt(2 / np.pi) * (x + 0.044715 * x ** 3))
-        return 0.5 + (0.5 * approx) + ((0.5 * x * erf_prime) / np.sqrt(2))
+        erf_prime = (2 / math.sqrt(math.pi)) * np.exp(-((x / math.sqrt(2)) ** 2))
+        approx = np.tanh(math.sqrt(2 / math.pi) * (x + 0.044715 * x ** 3))
+        return 0.5 + (0.5 * approx) + ((0.5 * x * erf_prime) / math.sqrt(2))
 
 
 class SELU(Activation):
@@ -239,6 +331,7 @@ class SELU(Activation):
     Cons: Need special initialization and regularization 
     """
     _verbose_name = "scaled exponential linear unit"
+    _prime_from_output = True
 
     def __init__(self):
         super().__init__()
@@ -252,6 +345,9 @@ class SELU(Activation):
     def activation_prime(self, x):
         return self.scale * np.where(x >= 0, 1.0, np.exp(x) * self.alpha)
 
+    def activation_prime_from_output(self, y):
+        return np.where(y >= 0, self.scale, y + self.scale * self.alpha)
+
 
 class Swish(Activation):
     """
@@ -269,7 +365,9 @@ class Swish(Activation):
         return x * self._sigmoid(x)
 
     def activation_prime(self, x):
-        return x * self._sigmoid.activation_prime(x) + self._sigmoid(x)
+        # output is not enough to find the derivative, but the sigmoid only has to be found once
+        s = self._sigmoid(x)
+        return s + x * s * (1.0 - s)
 
 
 class Softplus(Activation):
@@ -281,6 +379,7 @@ class Softplus(Activation):
     Cons: Slowish to compute compared to ReLU
     """
     _verbose_name = "softplus"
+    _prime_from_output = True
 
     def __init__(self):
         super().__init__()
@@ -292,6 +391,10 @@ class Softplus(Activation):
         exp_x = np.exp(x)
         return exp_x / (exp_x + 1)
 
+    def activation_prime_from_output(self, y):
+        # derivative is sigmoid(x), and e^y = 1 + e^x so sigmoid(x) = 1 - e^-y
+        return -np.expm1(-y)
+
 
 class Softmax(Activation):
     """
@@ -299,6 +402,8 @@ class Softmax(Activation):
     Good for output layer as it makes sum of 1.
     """
     _verbose_name = "softmax"
+    _prime_from_output = True
+    _flops_per_element = (4, 4)
 
     def __init__(self):
         super().__init__()
@@ -307,18 +412,29 @@ class Softmax(Activation):
         e_x = np.exp(x - np.max(x, axis=-1, keepdims=True))
         return e_x / np.sum(e_x, axis=-1, keepdims=True)
 
-    def backward(self, inputs, output_gradient, learning_rate=None):
-        # Create uninitialized array
-        input_derivative = np.empty_like(output_gradient)
-        output = self(inputs)
+    def forward_into(self, inputs, out):
+        np.subtract(inputs, np.max(inputs, axis=-1, keepdims=True), out=out)
+        np.exp(out, out=out)
+        out /= np.sum(out, axis=-1, keepdims=True)
+        return out
+
+    def backward(self, inputs, output_gradient, learning_rate=None, optimizer=None):
+        return self.backward_into(inputs, output_gradient, learning_rate, optimizer, np.empty_like(output_gradient))
+
+    def backward_into(self, inputs, output_gradient, learning_rate, optimizer, out):
+        if out is None:
+            return self.backward(inputs, output_gradient, learning_rate, optimizer)
+        return self.backward_from_output(self(inputs), output_gradient, out)
+
+    def backward_from_output(self, outputs, output_gradient, out=None):
+        if out is None:
+            out = np.empty_like(output_gradient)
 
-        # Enumerate outputs and gradients
-        for index, (single_output, single_grad) in enumerate(zip(output, output_gradient)):
-            single_output = single_output.reshape(-1, 1)
-            jacobian_matrix = np.diagflat(single_output) - np.dot(single_output, single_output.T)
-            input_derivative[index] = np.dot(jacobian_matrix, single_grad)
+        # Jacobian of each sample is diag(s) - s s^T, so multiplying it by the gradient g is just s * (g - sum(s * g))
+        np.multiply(outputs, output_gradient, out=out)
+        out -= outputs * np.sum(out, axis=-1, keepdims=True)
 
-        return input_derivative
+        return out
 
     def activation_prime(self, x, output_gradient):
         return self.backward(x, output_gradient)
\ No newline at end of file
@@ -1,3 +1,4 @@
+import inspect
 from abc import ABC, abstractmethod
 
 import numpy as np
@@ -5,6 +6,13 @@ import numpy as np
 
 class BaseLayer(ABC):
     _verbose_name = ""
+    _dtype = np.dtype(np.float64)
+    # layers that return views of their input (like reshape) do not need an output buffer
+    _allocates_output = True
+    # activations whose derivative can be found from their output, so their input does not need to be kept for backward
+    _prime_from_output = False
+    # input layers that take integer indexes, the network does not turn their inputs into floats
+    _index_inputs = False
     
     def __init__(self) -> None:
         super().__init__()
@@ -21,9 +29,55 @@ class BaseLayer(ABC):
         pass
     
     @abstractmethod
-    def backward(self, inputs: np.ndarray, output_gradient: np.ndarray, learning_rate: np.ndarray) -> np.ndarray:
+    def backward(self, inputs: np.ndarray, output_gradient: np.ndarray, learning_rate: float, optimizer=None) -> np.ndarray:
         pass
 
+    def parameters(self) -> dict[str, np.ndarray]:
+        """Trainable arrays of layer by attribute name"""
+        return {}
+
+    def set_parameters(self, arrays: dict[str, np.ndarray]) -> None:
+        """Replace trainable arrays by attribute name, arrays already in the layers dtype are used as is without copying"""
+        for name, array in arrays.items():
+            current = getattr(self, name)
+            if array.shape != current.shape:
+                raise ValueError(f"{self} expected {name} with shape {current.shape}, got {array.shape}")
+            setattr(self, name, array.astype(self._dtype, copy=False))
+
+    def get_config(self) -> dict:
+        """Arguments to make this layer again, by default attributes with the same name as arguments of __init__"""
+        arguments = inspect.signature(type(self).__init__).parameters
+        return {name: getattr(self, name) for name in arguments if name != "self" and hasattr(self, name)}
+
+    def output_shape(self, input_shape: tuple) -> tuple:
+        """Shape of one output sample for one input sample of input_shape, raises ValueError if the input does not fit"""
+        return tuple(input_shape)
+
+    def flops(self, input_shape: tuple, input_gradient: bool = True) -> tuple[int, int]:
+        """Rough floating point operations for (forward, backward) of one input sample, input_gradient is False when backward can skip it"""
+        return 0, 0
+
+    def gradient_size(self, input_shape: tuple, batch_size: int) -> int:
+        """Most elements of parameter gradients backward keeps for a batch of batch_size samples of input_shape"""
+        return sum(param.size for param in self.parameters().values())
+
+    def forward_into(self, inputs: np.ndarray, out: np.ndarray) -> np.ndarray:
+        """Forward writing into preallocated out, layers that can avoid allocating override this"""
+        np.copyto(out, self.forward(inputs))
+        return out
+
+    def backward_into(self, inputs: np.ndarray, output_gradient: np.ndarray, learning_rate: float, optimizer, out: np.ndarray) -> np.ndarray:
+        """Backward writing input gradient into preallocated out, if out is None the input gradient is not needed"""
+        input_gradient = self.backward(inputs, output_gradient, learning_rate, optimizer)
+        if out is None:
+            return input_gradient
+        np.copyto(out, input_gradient)
+        return out
+
+    def set_dtype(self, dtype) -> None:
+        """Set floating point type used for layers data and outputs"""
+        self._dtype = np.dtype(dtype)
+
     def save_params(self) -> tuple:
         """Returns layers mutable data, not the entire layer"""
         return ()
@@ -0,0 +1,5 @@
+from .storage import save_arrays, load_arrays
+from .sampler import BatchSampler
+from .prefetch import Prefetcher
+
+__all__ = [save_arrays, load_arrays, BatchSampler, Prefetcher]
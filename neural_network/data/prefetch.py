@@ -0,0 +1,86 @@
+import queue
+import threading
+
+_DONE = object()
+
+
+class _Failed:
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+class Prefetcher:
+    """
+    Makes items from batches ahead of time in the background, keeping up to prefetch ready ones in a queue, so data is
+    prepared while the network trains (numpy matrix multiplies release the GIL so threads can run at the same time).
+    batches is an iterable or a function returning a new iterable, which is used for each pass over the Prefetcher.
+    transform is applied to each item in a pool of worker threads, or processes if processes is True (then transform
+    must be a module level function that can be pickled). Items come out in the same order they went in.
+    """
+
+    def __init__(self, batches, transform=None, prefetch: int = 2, workers: int = 1, processes: bool = False) -> None:
+        if prefetch < 1:
+            raise ValueError(f"prefetch must be at least 1, got {prefetch}")
+        if workers < 1:
+            raise ValueError(f"workers must be at least 1, got {workers}")
+
+        self.batches = batches
+        self.transform = transform
+        self.prefetch = prefetch
+        self.workers = workers
+        self.processes = processes
+
+    def __len__(self) -> int:
+        return len(self.batches)
+
+    def __iter__(self):
+        source = self.batches() if callable(self.batches) else self.batches
+
+        # imported here as concurrent.futures is slow to import and only needed when iterating
+        from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+        pool = None
+        if self.transform is not None and (self.processes or self.workers > 1):
+            pool = (ProcessPoolExecutor if self.processes else ThreadPoolExecutor)(max_workers=self.workers)
+
+        ready = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    ready.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce() -> None:
+            try:
+                for item in source:
+                    if pool is not None:
+                        item = pool.submit(self.transform, item)
+                    elif self.transform is not None:
+                        item = self.transform(item)
+                    if not put(item):
+                        return
+                put(_DONE)
+            except BaseException as error:
+                put(_Failed(error))
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+
+        try:
+            while True:
+                item = ready.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, _Failed):
+                    raise item.error
+                yield item.result() if isinstance(item, Future) else item
+        finally:
+            stop.set()
+            producer.join()
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
@@ -0,0 +1,51 @@
+import numpy as np
+
+
+class BatchSampler:
+    """
+    Yields batches of rows from arrays with the same length, like (x, y).
+    Each epoch only an index vector is shuffled, rows for a batch are gathered into buffers that are reused for every batch,
+    so no copy of the full data set is made. A batch stays valid until n_buffers more batches have been made after it,
+    copy them if they need to be kept longer (or raise n_buffers, like when batches are prefetched).
+    Works with memory mapped arrays, only the rows in each batch are read.
+    """
+
+    def __init__(self, arrays: tuple[np.ndarray, ...], batch_size: int = 32, shuffle: bool = True, drop_last: bool = False, n_buffers: int = 1) -> None:
+        self.arrays = tuple(arrays)
+        self.length = len(self.arrays[0])
+
+        if any(len(array) != self.length for array in self.arrays):
+            raise ValueError(f"All arrays must have the same length, got {[len(array) for array in self.arrays]}")
+        if batch_size is not None and batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+        if n_buffers < 1:
+            raise ValueError(f"n_buffers must be at least 1, got {n_buffers}")
+
+        self.batch_size = batch_size or max(self.length, 1)
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.n_buffers = n_buffers
+
+        self._buffers = None
+
+    def __len__(self) -> int:
+        if self.drop_last:
+            return self.length // self.batch_size
+        return -(-self.length // self.batch_size)
+
+    def __iter__(self):
+        if not self.shuffle:
+            # in order batches are just views
+            for start in range(0, len(self) * self.batch_size, self.batch_size):
+                yield tuple(array[start:start + self.batch_size] for array in self.arrays)
+            return
+
+        if self._buffers is None:
+            self._buffers = tuple(np.empty((self.n_buffers, self.batch_size, *array.shape[1:]), dtype=array.dtype) for array in self.arrays)
+
+        order = np.random.permutation(self.length)
+        for batch, start in enumerate(range(0, len(self) * self.batch_size, self.batch_size)):
+            # sorted so gathering reads the arrays front to back, order in a batch does not change its gradient
+            indices = np.sort(order[start:start + self.batch_size])
+            slot = batch % self.n_buffers
+            yield tuple(np.take(array, indices, axis=0, out=buffer[slot, :len(indices)], mode="clip") for array, buffer in zip(self.arrays, self._buffers))
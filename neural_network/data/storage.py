@@ -0,0 +1,93 @@
+"""
+Simple on disk format for named numpy arrays that can be memory mapped instead of read and unpickled.
+
+Layout of a file:
+    8 bytes     magic, b"NNARRAYS"
+    8 bytes     length of the header in bytes, unsigned little endian
+    header      utf-8 JSON, padded with spaces so the first array starts on a 64 byte boundary
+    arrays      raw C ordered array data, each one starting on a 64 byte boundary
+
+The header looks like:
+    {"version": 1, "metadata": {...}, "arrays": [{"name": "x", "dtype": "|u1", "shape": [60000, 28, 28], "offset": 64}, ...]}
+where offset is from the start of the file.
+"""
+
+import json
+
+import numpy as np
+
+MAGIC = b"NNARRAYS"
+VERSION = 1
+ALIGNMENT = 64
+
+_PREFIX_SIZE = len(MAGIC) + 8
+
+
+def _align(position: int) -> int:
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+
+def save_arrays(file_path, arrays: dict[str, np.ndarray], metadata: dict = None) -> None:
+    """Write arrays to file_path, metadata is any extra JSON serializable data to keep with them"""
+    arrays = {name: np.asarray(array) for name, array in arrays.items()}
+
+    def build_header(data_start: int) -> bytes:
+        entries = []
+        offset = data_start
+        for name, array in arrays.items():
+            entries.append({"name": name, "dtype": array.dtype.str, "shape": list(array.shape), "offset": offset})
+            offset = _align(offset + array.nbytes)
+        return json.dumps({"version": VERSION, "metadata": metadata or {}, "arrays": entries}).encode("utf-8")
+
+    # offsets are part of the header, so grow the data start until the header fits in front of it
+    data_start = _align(_PREFIX_SIZE)
+    header = build_header(data_start)
+    while _PREFIX_SIZE + len(header) > data_start:
+        data_start = _align(_PREFIX_SIZE + len(header))
+        header = build_header(data_start)
+    header = header.ljust(data_start - _PREFIX_SIZE, b" ")
+
+    with open(file_path, "wb") as file:
+        file.write(MAGIC)
+        file.write(len(header).to_bytes(8, "little"))
+        file.write(header)
+        for array in arrays.values():
+            file.write(b"\0" * (_align(file.tell()) - file.tell()))
+            file.write(np.ascontiguousarray(array).tobytes())
+
+
+def read_header(file_path) -> dict:
+    with open(file_path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{file_path} is not an array file")
+        header_size = int.from_bytes(file.read(8), "little")
+        header = json.loads(file.read(header_size).decode("utf-8"))
+    if header["version"] > VERSION:
+        raise ValueError(f"{file_path} has version {header['version']}, only up to {VERSION} is supported")
+    return header
+
+
+def load_arrays(file_path, mode: str = "r") -> tuple[dict[str, np.ndarray], dict]:
+    """
+    Open arrays saved with save_arrays, returns (arrays, metadata).
+    Arrays are memory mapped so nothing is read until it is used. mode is the same as np.memmap: "r" read only,
+    "c" copy on write, "r+" to write changes back to the file, or None to read everything into memory instead.
+    """
+    header = read_header(file_path)
+
+    arrays = {}
+    if mode is None:
+        with open(file_path, "rb") as file:
+            for entry in header["arrays"]:
+                dtype, shape = np.dtype(entry["dtype"]), tuple(entry["shape"])
+                file.seek(entry["offset"])
+                arrays[entry["name"]] = np.fromfile(file, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+        return arrays, header["metadata"]
+
+    for entry in header["arrays"]:
+        dtype, shape = np.dtype(entry["dtype"]), tuple(entry["shape"])
+        if 0 in shape:
+            arrays[entry["name"]] = np.empty(shape, dtype=dtype)
+        else:
+            arrays[entry["name"]] = np.memmap(file_path, dtype=dtype, mode=mode, offset=entry["offset"], shape=shape)
+    return arrays, header["metadata"]
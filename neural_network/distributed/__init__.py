@@ -0,0 +1,4 @@
+from .group import ProcessGroup
+from .data_parallel import DistributedDataParallel
+
+__all__ = [ProcessGroup, DistributedDataParallel]
@@ -0,0 +1,80 @@
+import numpy as np
+
+from neural_network.network.parallel import _GradientCollector, _parameter_layout, _views
+from neural_network.optimizers.optimizers import Optimizer
+from neural_network.distributed.group import ProcessGroup
+
+
+class DistributedDataParallel:
+    """
+    Trains copies of a network in every rank of a ProcessGroup, each on its own data (like group.shard(x)).
+    Parameters start as rank 0's, after every batch gradients and losses are averaged over the ranks with a ring
+    allreduce and every rank applies the same update, so they stay identical. Give every rank the same batch size
+    and number of steps. With compress gradients are sent as float16. A group of 1 trains like normal.
+    Use as a context manager around calls to train or train_stream:
+        with DistributedDataParallel(network) as ddp:
+            network.train(ddp.group.shard(x), ddp.group.shard(y))
+    """
+
+    def __init__(self, network, group: ProcessGroup = None, compress: bool = False) -> None:
+        self.network = network
+        self._owns_group = group is None
+        self.group = ProcessGroup.from_environment() if group is None else group
+        self.compress = compress
+
+        self._started = False
+
+    def __enter__(self) -> "DistributedDataParallel":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def start(self) -> None:
+        """Copy rank 0's parameters to every rank and start averaging gradients"""
+        if self._started:
+            raise ValueError("DistributedDataParallel has already been started")
+        self._started = True
+
+        if self.group.world_size == 1:
+            return
+
+        network = self.network
+        self._layout, size = _parameter_layout(network.layers, network.dtype)
+
+        # the loss is sent along with the gradients as the last value
+        self._vector = np.zeros(size + 1, dtype=network.dtype)
+        views = _views(self._vector, self._layout)
+
+        for (index, name, _, _), view in zip(self._layout, views):
+            view[...] = getattr(network.layers[index], name)
+        self.group.broadcast(self._vector)
+        for (index, name, _, _), view in zip(self._layout, views):
+            getattr(network.layers[index], name)[...] = view
+
+        self._gradients = views
+        self._collector = _GradientCollector({(id(network.layers[index]), name): view for (index, name, _, _), view in zip(self._layout, views)})
+
+        network._parallel = self
+
+    def close(self) -> None:
+        if not self._started:
+            return
+        self._started = False
+        self.network._parallel = None
+        if self._owns_group:
+            self.group.close()
+
+    def train_batch(self, x_batch: np.ndarray, y_batch: np.ndarray, learning_rate: float, optimizer: Optimizer) -> float:
+        """Train on this ranks batch with gradients averaged over every rank, returns the average loss"""
+        network = self.network
+        layers, loss_function = network._training_head()
+
+        self._vector[-1] = network._train_batch(x_batch, y_batch, layers, loss_function, learning_rate, self._collector, network._workspace)
+        self.group.allreduce(self._vector, average=True, compress=self.compress)
+
+        for (index, name, _, _), gradient in zip(self._layout, self._gradients):
+            optimizer.update(network.layers[index], name, gradient, learning_rate)
+
+        return float(self._vector[-1])
@@ -0,0 +1,216 @@
+import json
+import os
+import socket
+import threading
+import time
+
+import numpy as np
+
+_CONNECT_RETRY_SECONDS = 0.1
+
+
+def _send_message(connection: socket.socket, message) -> None:
+    data = json.dumps(message).encode("utf-8")
+    connection.sendall(len(data).to_bytes(8, "little") + data)
+
+
+def _receive_exact(connection: socket.socket, buffer) -> None:
+    view = memoryview(buffer).cast("B")
+    received = 0
+    while received < len(view):
+        count = connection.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError("Connection closed by the other rank")
+        received += count
+
+
+def _receive_message(connection: socket.socket):
+    size = bytearray(8)
+    _receive_exact(connection, size)
+    data = bytearray(int.from_bytes(size, "little"))
+    _receive_exact(connection, data)
+    return json.loads(data.decode("utf-8"))
+
+
+def _connect(address: tuple[str, int], timeout: float) -> socket.socket:
+    """Connect to address, trying again until timeout as the other side may not be listening yet"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            connection = socket.create_connection(address, timeout=timeout)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(_CONNECT_RETRY_SECONDS)
+            continue
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return connection
+
+
+class ProcessGroup:
+    """
+    A group of world_size processes (ranks), possibly on different machines, connected in a ring over TCP.
+    Rank 0 listens on master_addr:master_port so the others can find each other, after that every rank only talks
+    to the ranks before and after it in the ring. With a world size of 1 nothing is connected and every operation does nothing.
+    """
+
+    def __init__(self, rank: int = 0, world_size: int = 1, master_addr: str = "127.0.0.1", master_port: int = 29500, timeout: float = 300.0) -> None:
+        if world_size < 1:
+            raise ValueError(f"world_size must be at least 1, got {world_size}")
+        if not 0 <= rank < world_size:
+            raise ValueError(f"rank must be between 0 and {world_size - 1}, got {rank}")
+
+        self.rank = rank
+        self.world_size = world_size
+        self.master_addr = master_addr
+        self.master_port = master_port
+
+        self._next = self._previous = None
+        self._scratch = None
+
+        if world_size > 1:
+            self._connect_ring(timeout)
+
+    @classmethod
+    def from_environment(cls, timeout: float = 300.0) -> "ProcessGroup":
+        """Make a group from the RANK, WORLD_SIZE, MASTER_ADDR and MASTER_PORT environment variables set by the launcher, with none set this is a group of 1"""
+        return cls(
+            rank=int(os.environ.get("RANK", 0)),
+            world_size=int(os.environ.get("WORLD_SIZE", 1)),
+            master_addr=os.environ.get("MASTER_ADDR", "127.0.0.1"),
+            master_port=int(os.environ.get("MASTER_PORT", 29500)),
+            timeout=timeout,
+        )
+
+    def __enter__(self) -> "ProcessGroup":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(rank={self.rank}, world_size={self.world_size})"
+
+    def _connect_ring(self, timeout: float) -> None:
+        listener = socket.create_server(("", 0))
+        listener.settimeout(timeout)
+        port = listener.getsockname()[1]
+
+        # rank 0 collects where every rank is listening and tells everyone
+        if self.rank == 0:
+            addresses = [[self.master_addr, port]] + [None] * (self.world_size - 1)
+            with socket.create_server(("", self.master_port)) as server:
+                server.settimeout(timeout)
+                connections = []
+                for _ in range(self.world_size - 1):
+                    connection, (host, _) = server.accept()
+                    message = _receive_message(connection)
+                    addresses[message["rank"]] = [host, message["port"]]
+                    connections.append(connection)
+                for connection in connections:
+                    _send_message(connection, addresses)
+                    connection.close()
+        else:
+            with _connect((self.master_addr, self.master_port), timeout) as connection:
+                _send_message(connection, {"rank": self.rank, "port": port})
+                addresses = _receive_message(connection)
+
+        # connecting finishes before the other side accepts, so every rank can connect first without waiting
+        next_rank = (self.rank + 1) % self.world_size
+        self._next = _connect(tuple(addresses[next_rank]), timeout)
+        _send_message(self._next, self.rank)
+
+        self._previous, _ = listener.accept()
+        self._previous.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        listener.close()
+
+        previous_rank = _receive_message(self._previous)
+        if previous_rank != (self.rank - 1) % self.world_size:
+            raise ConnectionError(f"Rank {self.rank} expected rank {(self.rank - 1) % self.world_size} before it in the ring, got {previous_rank}")
+
+        self._next.settimeout(None)
+        self._previous.settimeout(None)
+
+    def close(self) -> None:
+        for connection in (self._next, self._previous):
+            if connection is not None:
+                connection.close()
+        self._next = self._previous = None
+
+    def _exchange(self, send: np.ndarray, receive: np.ndarray) -> None:
+        """Send to the next rank while receiving from the previous one, both at once so large arrays can not deadlock"""
+        sender = threading.Thread(target=self._next.sendall, args=(memoryview(send).cast("B"),))
+        sender.start()
+        _receive_exact(self._previous, receive)
+        sender.join()
+
+    def _scratch_buffer(self, size: int, dtype: np.dtype) -> np.ndarray:
+        if self._scratch is None or self._scratch.dtype != dtype or self._scratch.size < size:
+            self._scratch = np.empty(size, dtype=dtype)
+        return self._scratch[:size]
+
+    def allreduce(self, array: np.ndarray, average: bool = False, compress: bool = False) -> np.ndarray:
+        """
+        Sum (or average) a contiguous array over every rank in place with a ring allreduce, each rank sends about
+        2 * array.nbytes no matter how many ranks there are. With compress parts are sent as float16, halving (or
+        quartering for float64) what is sent at the cost of precision. Every rank ends with exactly the same values.
+        """
+        if self.world_size == 1:
+            return array
+        if not array.flags.c_contiguous:
+            raise ValueError("allreduce needs a C contiguous array")
+
+        flat = array.reshape(-1)
+        wire_dtype = np.dtype(np.float16) if compress else flat.dtype
+        bounds = np.linspace(0, flat.size, self.world_size + 1).astype(int)
+        chunks = [flat[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+
+        # reduce scatter, after this each rank holds the full sum of chunk (rank + 1)
+        for step in range(self.world_size - 1):
+            send = chunks[(self.rank - step) % self.world_size]
+            target = chunks[(self.rank - step - 1) % self.world_size]
+            received = self._scratch_buffer(target.size, wire_dtype)
+            self._exchange(send.astype(wire_dtype) if compress else send, received)
+            target += received
+
+        owned = chunks[(self.rank + 1) % self.world_size]
+        if average:
+            owned /= self.world_size
+        if compress:
+            # rounded the same way the other ranks will see it
+            owned[...] = owned.astype(wire_dtype)
+
+        # all gather, pass the finished chunks around the ring
+        for step in range(self.world_size - 1):
+            send = chunks[(self.rank - step + 1) % self.world_size]
+            target = chunks[(self.rank - step) % self.world_size]
+            if compress:
+                received = self._scratch_buffer(target.size, wire_dtype)
+                self._exchange(send.astype(wire_dtype), received)
+                target[...] = received
+            else:
+                self._exchange(send, target)
+
+        return array
+
+    def broadcast(self, array: np.ndarray, root: int = 0) -> np.ndarray:
+        """Copy a contiguous array from rank root to every rank in place, passed along the ring"""
+        if self.world_size == 1:
+            return array
+        if not array.flags.c_contiguous:
+            raise ValueError("broadcast needs a C contiguous array")
+
+        if self.rank != root:
+            _receive_exact(self._previous, array)
+        if (self.rank + 1) % self.world_size != root:
+            self._next.sendall(memoryview(array.reshape(-1)).cast("B"))
+        return array
+
+    def barrier(self) -> None:
+        """Wait until every rank gets here"""
+        self.allreduce(np.zeros(1))
+
+    def shard(self, array: np.ndarray) -> np.ndarray:
+        """This ranks share of array, every rank gets the same number of rows so they all take the same number of steps"""
+        usable = len(array) // self.world_size * self.world_size
+        return array[self.rank:usable:self.world_size]
@@ -0,0 +1,62 @@
+"""
+Start the ranks of a distributed training script on this machine.
+
+    python -m neural_network.distributed.launch --nproc 4 train.py [script args...]
+
+For more than one machine run the same command on each with --nnodes, a different --node-rank, and --master-addr
+set to the address of node 0. Every rank gets RANK, LOCAL_RANK, WORLD_SIZE, MASTER_ADDR and MASTER_PORT in its
+environment, which ProcessGroup.from_environment reads.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+_POLL_SECONDS = 0.1
+
+
+def launch(script_args: list[str], nproc: int = 1, nnodes: int = 1, node_rank: int = 0, master_addr: str = "127.0.0.1", master_port: int = 29500) -> int:
+    """Run nproc ranks of a python script and wait for them, if one fails the others are stopped. Returns the exit code"""
+    world_size = nproc * nnodes
+
+    processes = []
+    for local_rank in range(nproc):
+        env = dict(os.environ, RANK=str(node_rank * nproc + local_rank), LOCAL_RANK=str(local_rank), WORLD_SIZE=str(world_size),
+                   MASTER_ADDR=master_addr, MASTER_PORT=str(master_port))
+        processes.append(subprocess.Popen([sys.executable, *script_args], env=env))
+
+    try:
+        while True:
+            codes = [process.poll() for process in processes]
+            failed = [code for code in codes if code not in (None, 0)]
+            if failed:
+                return failed[0]
+            if all(code == 0 for code in codes):
+                return 0
+            time.sleep(_POLL_SECONDS)
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def main(argv: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Start the ranks of a distributed training script on this machine")
+    parser.add_argument("--nproc", type=int, default=1, help="ranks to start on this machine")
+    parser.add_argument("--nnodes", type=int, default=1, help="number of machines")
+    parser.add_argument("--node-rank", type=int, default=0, help="which machine this is, 0 is the one at --master-addr")
+    parser.add_argument("--master-addr", default="127.0.0.1", help="address of node 0")
+    parser.add_argument("--master-port", type=int, default=29500, help="port rank 0 listens on")
+    parser.add_argument("script", help="python script to run")
+    parser.add_argument("script_args", nargs=argparse.REMAINDER, help="arguments for the script")
+    args = parser.parse_args(argv)
+
+    sys.exit(launch([args.script, *args.script_args], args.nproc, args.nnodes, args.node_rank, args.master_addr, args.master_port))
+
+
+if __name__ == "__main__":
+    main()
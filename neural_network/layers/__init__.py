@@ -1,3 +1,3 @@
-from .layers import Reshape, Dense
+from .layers import Reshape, Dense, SparseDense, QuantizedDense
 
-__all__ = [Reshape, Dense]
\ No newline at end of file
+__all__ = [Reshape, Dense, SparseDense, QuantizedDense]
\ No newline at end of file
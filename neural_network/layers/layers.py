@@ -3,6 +3,7 @@ from abc import ABC, abstractmethod
 import numpy as np
 
 from neural_network.base import BaseLayer
+from neural_network.optimizers.optimizers import Optimizer, SGD
 
 
 class Layer(BaseLayer, ABC):
@@ -18,48 +19,316 @@ class Layer(BaseLayer, ABC):
 
 class Reshape(Layer):
     _verbose_name = "reshape"
+    _allocates_output = False
     
     def __init__(self, in_shape, out_shape) -> None:
         super().__init__()
         self.in_shape = in_shape
         self.out_shape = out_shape
 
+    def output_shape(self, input_shape):
+        if tuple(input_shape) != tuple(self.in_shape):
+            raise ValueError(f"{self} expected input shape {tuple(self.in_shape)}, got {tuple(input_shape)}")
+        return tuple(self.out_shape)
+
     def forward(self, inputs):
         return inputs.reshape(-1, *self.out_shape)
+
+    def forward_into(self, inputs, out):
+        return self.forward(inputs)
     
-    def backward(self, inputs, output_gradient, learning_rate):
-        return inputs * output_gradient.reshape(-1, *self.in_shape)
+    def backward(self, inputs, output_gradient, learning_rate, optimizer=None):
+        return output_gradient.reshape(-1, *self.in_shape)
 
 class Dense(Layer):
     _verbose_name = "fully connected layer"
     
-    def __init__(self, n_inputs, n_outputs) -> None:
-        self.weights = np.random.randn(n_inputs, n_outputs) * 0.01
-        self.biases = np.zeros((1, n_outputs), dtype=np.float64)
+    def __init__(self, n_inputs, n_outputs, dtype=np.float64) -> None:
+        self._dtype = np.dtype(dtype)
+        self.weights = (np.random.randn(n_inputs, n_outputs) * 0.01).astype(self._dtype)
+        self.biases = np.zeros((1, n_outputs), dtype=self._dtype)
+
+        # reused between batches so training does not allocate new gradients every step
+        self._weights_gradient = None
+        self._biases_gradient = None
+        self._input_gradient = None
      
+    def parameters(self):
+        return {"weights": self.weights, "biases": self.biases}
+
+    def get_config(self):
+        n_inputs, n_outputs = self.weights.shape
+        return {"n_inputs": n_inputs, "n_outputs": n_outputs}
+
+    def flops(self, input_shape, input_gradient=True):
+        n_inputs, n_outputs = self.weights.shape
+        multiply = 2 * n_inputs * n_outputs
+        # weights gradient and bias gradient, then the input gradient if it is needed
+        return multiply + n_outputs, multiply + n_outputs + (multiply if input_gradient else 0)
+
+    def output_shape(self, input_shape):
+        n_inputs, n_outputs = self.weights.shape
+        if tuple(input_shape) != (n_inputs,):
+            raise ValueError(f"{self} expected input shape {(n_inputs,)}, got {tuple(input_shape)}")
+        return (n_outputs,)
+
     def forward(self, inputs):
         return np.dot(inputs, self.weights) + self.biases
 
-    def backward(self, inputs, output_gradient, learning_rate):
-        weights_gradient = np.dot(inputs.T, output_gradient)
+    def forward_into(self, inputs, out):
+        np.dot(inputs, self.weights, out=out)
+        out += self.biases
+        return out
 
-        bias_gradient = np.sum(output_gradient, axis=0, keepdims=True)
+    def _gradient_buffers(self):
+        if self._weights_gradient is None or self._weights_gradient.dtype != self.weights.dtype:
+            self._weights_gradient = np.empty_like(self.weights)
+            self._biases_gradient = np.empty_like(self.biases)
+        return self._weights_gradient, self._biases_gradient
 
-        input_gradient = np.dot(output_gradient, self.weights.T)
+    def _input_gradient_buffer(self, output_gradient):
+        input_shape = (len(output_gradient), self.weights.shape[0])
+        if self._input_gradient is None or self._input_gradient.shape != input_shape or self._input_gradient.dtype != output_gradient.dtype:
+            self._input_gradient = np.empty(input_shape, dtype=output_gradient.dtype)
+        return self._input_gradient
+
+    def backward(self, inputs, output_gradient, learning_rate, optimizer: Optimizer = None):
+        return self.backward_into(inputs, output_gradient, learning_rate, optimizer, self._input_gradient_buffer(output_gradient))
+
+    def backward_into(self, inputs, output_gradient, learning_rate, optimizer, out):
+        weights_gradient, bias_gradient = self._gradient_buffers()
+
+        np.dot(inputs.T, output_gradient, out=weights_gradient)
+
+        np.sum(output_gradient, axis=0, keepdims=True, out=bias_gradient)
+
+        # the first layer of a network has nothing to pass its input gradient to, so it can skip the biggest matrix multiplication
+        if out is not None:
+            np.dot(output_gradient, self.weights.T, out=out)
         
-        self.weights = self.weights - learning_rate * weights_gradient
-        self.biases = self.biases - learning_rate * bias_gradient
+        if optimizer is None:
+            optimizer = SGD()
+
+        optimizer.update(self, "weights", weights_gradient, learning_rate)
+        optimizer.update(self, "biases", bias_gradient, learning_rate)
         
-        return input_gradient
+        return out
+    
+    def set_dtype(self, dtype) -> None:
+        super().set_dtype(dtype)
+        self.weights = self.weights.astype(self._dtype, copy=False)
+        self.biases = self.biases.astype(self._dtype, copy=False)
     
     def save_params(self) -> tuple:
-        return (self.weights.tobytes(), self.biases.tobytes())
+        return (self.weights.tobytes(), self.biases.tobytes(), self.weights.dtype.str)
     
     def load_params(self, params: tuple) -> None:
-        weights, biases = params
+        # files saved before dtype was stored are always float64
+        weights, biases, *saved_dtype = params
+        saved_dtype = np.dtype(saved_dtype[0] if saved_dtype else np.float64)
         
-        weights = np.frombuffer(weights, dtype=np.float64, like=self.weights).reshape(self.weights.shape)
-        biases = np.frombuffer(biases, dtype=np.float64, like=self.biases).reshape(self.biases.shape)
+        weights = np.frombuffer(weights, dtype=saved_dtype).reshape(self.weights.shape)
+        biases = np.frombuffer(biases, dtype=saved_dtype).reshape(self.biases.shape)
         
-        self.weights = weights
-        self.biases = biases
\ No newline at end of file
+        self.weights = weights.astype(self._dtype)
+        self.biases = biases.astype(self._dtype)
+
+
+
+class SparseDense(Dense):
+    """
+    Dense for inputs that are mostly zeros with a few ones (like one hot characters), given as the indexes of the ones.
+    Each sample is a row of integer indexes into the n_inputs inputs, -1 for nothing (so samples can have fewer ones).
+    The output is the sum of the weight rows picked, which is the same as Dense on the one hot vector without multiplying
+    all the zeros, and backward only adds gradients to the picked rows. Weights are the same as Dense(n_inputs, n_outputs)
+    so saved Dense parameters load into it. It has no gradient for its inputs, so it can only be the first layer.
+    """
+    _verbose_name = "sparse fully connected layer"
+    _index_inputs = True
+
+    def flops(self, input_shape, input_gradient=True):
+        n_inputs, n_outputs = self.weights.shape
+        picked = int(np.prod(input_shape))
+        return picked * n_outputs + n_outputs, picked * n_outputs + n_outputs
+
+    def gradient_size(self, input_shape, batch_size):
+        n_inputs, n_outputs = self.weights.shape
+        # gradients and pick counts for each row picked in the batch, not the whole weights
+        rows = min(batch_size * int(np.prod(input_shape)), n_inputs)
+        return rows * (n_outputs + batch_size) + n_outputs
+
+    def output_shape(self, input_shape):
+        if len(input_shape) != 1:
+            raise ValueError(f"{self} expected one row of indexes for each sample, got input shape {tuple(input_shape)}")
+        return (self.weights.shape[1],)
+
+    def forward(self, inputs):
+        return self.forward_into(inputs, np.empty((len(inputs), self.weights.shape[1]), dtype=self.weights.dtype))
+
+    def forward_into(self, inputs, out):
+        out[...] = self.biases
+        # one column of indexes at a time only gathers batch size rows at once, which stays in cache
+        picked = np.empty_like(out)
+        for column in inputs.T:
+            used = column >= 0
+            if used.all():
+                np.take(self.weights, column, axis=0, out=picked)
+                out += picked
+            elif used.any():
+                out[used] += self.weights[column[used]]
+        return out
+
+    def backward(self, inputs, output_gradient, learning_rate, optimizer: Optimizer = None):
+        return self.backward_into(inputs, output_gradient, learning_rate, optimizer, None)
+
+    def backward_into(self, inputs, output_gradient, learning_rate, optimizer, out):
+        if out is not None:
+            raise ValueError(f"{self} has no gradient for its inputs, it has to be the first layer")
+
+        used = inputs >= 0
+        samples = np.broadcast_to(np.arange(len(inputs))[:, None], inputs.shape)[used]
+        rows, picked_rows = np.unique(inputs[used], return_inverse=True)
+
+        # how many times each sample picked each row, so rows picked more than once get the sum of their gradients
+        picks = np.zeros((len(rows), len(inputs)), dtype=output_gradient.dtype)
+        np.add.at(picks, (picked_rows, samples), 1)
+        weights_gradient = np.dot(picks, output_gradient)
+
+        # only the biases gradient is kept, a full size weights gradient is what this layer avoids
+        if self._biases_gradient is None or self._biases_gradient.dtype != self.biases.dtype:
+            self._biases_gradient = np.empty_like(self.biases)
+        bias_gradient = np.sum(output_gradient, axis=0, keepdims=True, out=self._biases_gradient)
+
+        if optimizer is None:
+            optimizer = SGD()
+
+        optimizer.update_rows(self, "weights", rows, weights_gradient, learning_rate)
+        optimizer.update(self, "biases", bias_gradient, learning_rate)
+
+        return None
+
+class QuantizedDense(Layer):
+    """
+    Inference only Dense with int8 weights and a float scale for each output, made from a trained layer with from_dense.
+    It only saves weight memory (8x less than float64, 4x less than float32) and is slower than a float32 Dense: block_size
+    rows of weights at a time are made float32 for the multiplication, which gives exact integer sums of the int8 values.
+    """
+    _verbose_name = "quantized fully connected layer"
+
+    def __init__(self, n_inputs, n_outputs, block_size=256) -> None:
+        super().__init__()
+        if block_size < 1:
+            raise ValueError(f"block_size must be at least 1, got {block_size}")
+        self.block_size = block_size
+
+        self.weights = np.zeros((n_inputs, n_outputs), dtype=np.int8)
+        self.scales = np.ones((1, n_outputs), dtype=np.float32)
+        self.biases = np.zeros((1, n_outputs), dtype=self._dtype)
+
+        # all zero weights can never add up past 2**24
+        self._exact_runs = [(0, n_inputs)]
+
+    @classmethod
+    def from_dense(cls, dense: Dense, block_size=256) -> "QuantizedDense":
+        """Round the weights of dense to int8, each output (column) is scaled so its largest weight becomes 127"""
+        n_inputs, n_outputs = dense.weights.shape
+        layer = cls(n_inputs, n_outputs, block_size)
+        layer.set_dtype(dense.biases.dtype)
+
+        weights = dense.weights.astype(np.float64)
+        scales = np.max(np.abs(weights), axis=0, keepdims=True) / 127
+        scales[scales == 0] = 1
+
+        layer.set_parameters({"weights": np.rint(weights / scales), "scales": scales, "biases": dense.biases})
+        return layer
+
+    def parameters(self):
+        return {"weights": self.weights, "scales": self.scales, "biases": self.biases}
+
+    def set_parameters(self, arrays):
+        # weights and scales keep their own types, only biases follow the networks dtype
+        types = {"weights": np.int8, "scales": np.float32, "biases": self._dtype}
+        for name, array in arrays.items():
+            current = getattr(self, name)
+            if array.shape != current.shape:
+                raise ValueError(f"{self} expected {name} with shape {current.shape}, got {array.shape}")
+            setattr(self, name, array.astype(types[name], copy=False))
+        if "weights" in arrays:
+            self._exact_runs = self._find_exact_runs()
+
+    def get_config(self):
+        n_inputs, n_outputs = self.weights.shape
+        return {"n_inputs": n_inputs, "n_outputs": n_outputs, "block_size": self.block_size}
+
+    def flops(self, input_shape, input_gradient=True):
+        n_inputs, n_outputs = self.weights.shape
+        # rounding the inputs, the multiplication, then scaling back and adding biases
+        return 3 * n_inputs + 2 * n_inputs * n_outputs + 3 * n_outputs, 0
+
+    def output_shape(self, input_shape):
+        n_inputs, n_outputs = self.weights.shape
+        if tuple(input_shape) != (n_inputs,):
+            raise ValueError(f"{self} expected input shape {(n_inputs,)}, got {tuple(input_shape)}")
+        return (n_outputs,)
+
+    def _find_exact_runs(self) -> list[tuple[int, int]]:
+        """(start, stop) of runs of inputs where 127 times the sum of any outputs absolute weights stays within 2**24"""
+        limit = 2**24 // 127
+        totals = np.cumsum(np.abs(self.weights, dtype=np.int32), axis=0)
+
+        runs = []
+        start = 0
+        while start < len(totals):
+            before = totals[start - 1] if start else 0
+            fits = np.all(totals[start:] - before <= limit, axis=1)
+            stop = len(totals) if fits.all() else start + int(np.argmin(fits))
+            runs.append((start, stop))
+            start = stop
+        return runs
+
+    def forward(self, inputs):
+        return self.forward_into(inputs, np.empty((len(inputs), self.weights.shape[1]), dtype=np.result_type(inputs.dtype, self.biases.dtype)))
+
+    def forward_into(self, inputs, out):
+        n_inputs, n_outputs = self.weights.shape
+
+        quantized = inputs.astype(np.float32)
+        largest = np.maximum(np.max(quantized, axis=1, keepdims=True), -np.min(quantized, axis=1, keepdims=True))
+        largest[largest == 0] = 127
+        quantized *= 127 / largest
+        np.rint(quantized, out=quantized)
+
+        weights_block = np.empty((min(self.block_size, n_inputs), n_outputs), dtype=np.float32)
+        run_total = np.empty((len(inputs), n_outputs), dtype=np.float32)
+        product = np.empty_like(run_total) if self.block_size < n_inputs else None
+        total = None
+
+        for run_start, run_stop in self._exact_runs:
+            for start in range(run_start, run_stop, self.block_size):
+                stop = min(start + self.block_size, run_stop)
+                block = weights_block[:stop - start]
+                np.copyto(block, self.weights[start:stop], casting="unsafe")
+                if start == run_start:
+                    np.dot(quantized[:, start:stop], block, out=run_total)
+                else:
+                    np.dot(quantized[:, start:stop], block, out=product)
+                    run_total += product
+
+            if len(self._exact_runs) == 1:
+                total = run_total
+            elif total is None:
+                total = run_total.astype(np.float64)
+            else:
+                total += run_total
+
+        total *= largest / 127
+        total *= self.scales
+        np.add(total, self.biases, out=out, casting="same_kind")
+        return out
+
+    def backward(self, inputs, output_gradient, learning_rate, optimizer=None):
+        raise TypeError(f"{self} is inference only, train the float network and quantize it again")
+
+    def set_dtype(self, dtype) -> None:
+        super().set_dtype(dtype)
+        self.biases = self.biases.astype(self._dtype, copy=False)
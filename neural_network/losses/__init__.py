@@ -1,3 +1,3 @@
-from .losses import MSE, BinaryCrossEntropy, CategoricalCrossEntropy
+from .losses import MSE, BinaryCrossEntropy, CategoricalCrossEntropy, SparseBinaryCrossEntropy, SparseCategoricalCrossEntropy, SoftmaxCategoricalCrossEntropy
 
-__all__ = [MSE, BinaryCrossEntropy, CategoricalCrossEntropy]
\ No newline at end of file
+__all__ = [MSE, BinaryCrossEntropy, CategoricalCrossEntropy, SparseBinaryCrossEntropy, SparseCategoricalCrossEntropy, SoftmaxCategoricalCrossEntropy]
\ No newline at end of file
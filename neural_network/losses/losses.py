@@ -12,24 +12,35 @@ class Loss(BaseLayer, ABC):
  
     def _labels_to_one_hot(self, y_true: np.ndarray, y_pred: np.ndarray) -> np.ndarray:
         classes = np.size(y_pred, 1)
-        y_true = np.eye(classes)[y_true]
+        y_true = np.eye(classes, dtype=y_pred.dtype)[y_true]
         return y_true
     
+    def _uses_categorical_labels(self, y_true: np.ndarray) -> bool:
+        return self.categorical_labels or (self.categorical_labels is None and y_true.ndim == 1)
+    
     def forward(self, y_true: np.ndarray, y_pred: np.ndarray) -> float:
-        if self.categorical_labels or (self.categorical_labels is None and y_true.ndim == 1):
+        if self._uses_categorical_labels(y_true):
             y_true = self._labels_to_one_hot(y_true, y_pred)
         
         loss = self.loss(y_true, y_pred)
         return np.mean(loss)
     
     def backward(self, y_true: np.ndarray, y_pred: np.ndarray) -> np.ndarray:
-        if self.categorical_labels or (self.categorical_labels is None and y_true.ndim == 1):
+        if self._uses_categorical_labels(y_true):
             y_true = self._labels_to_one_hot(y_true, y_pred)
             
         samples = np.size(y_true, 0)
         loss_prime = self.loss_prime(y_true, y_pred)
         
-        return loss_prime / samples
+        return (loss_prime / samples).astype(y_pred.dtype, copy=False)
+    
+    def flops(self, input_shape, input_gradient=True):
+        elements = int(np.prod(input_shape))
+        return 3 * elements, 3 * elements
+
+    def forward_backward(self, y_true: np.ndarray, y_pred: np.ndarray) -> tuple[float, np.ndarray]:
+        """Loss and its gradient together, losses that share work between the two can override this"""
+        return self.forward(y_true, y_pred), self.backward(y_true, y_pred)
     
     @abstractmethod
     def loss(self, y_true: np.ndarray, y_pred: np.ndarray) -> np.ndarray:
@@ -75,4 +86,109 @@ class CategoricalCrossEntropy(Loss):
     
     def loss_prime(self, y_true, y_pred):
         y_pred = np.clip(y_pred, 1e-7, 1 - 1e-7)
-        return -y_true / y_pred
\ No newline at end of file
+        return -y_true / y_pred
+
+class SparseLoss(Loss, ABC):
+    """Loss for integer labels, reads predictions by label index instead of building one hot labels"""
+    
+    def __init__(self) -> None:
+        super().__init__(categorical_labels=True)
+        self._rows = np.arange(0)
+        self._gradient = None
+    
+    def _sample_rows(self, samples: int) -> np.ndarray:
+        if len(self._rows) < samples:
+            self._rows = np.arange(samples)
+        return self._rows[:samples]
+    
+    def _gradient_buffer(self, y_pred: np.ndarray) -> np.ndarray:
+        if self._gradient is None or self._gradient.shape != y_pred.shape or self._gradient.dtype != y_pred.dtype:
+            self._gradient = np.empty_like(y_pred)
+        return self._gradient
+    
+    def forward(self, y_true, y_pred):
+        return np.mean(self.loss(y_true, y_pred))
+    
+    def backward(self, y_true, y_pred):
+        gradient = self.loss_prime(y_true, y_pred)
+        gradient /= np.size(y_pred, 0)
+        return gradient
+    
+class SparseCategoricalCrossEntropy(SparseLoss):
+    _verbose_name = "sparse categorical cross entropy"
+    
+    def __init__(self) -> None:
+        super().__init__()
+    
+    def _picked(self, y_true, y_pred):
+        picked = y_pred[self._sample_rows(len(y_true)), y_true]
+        return np.clip(picked, 1e-7, 1 - 1e-7)
+    
+    def loss(self, y_true, y_pred):
+        return -np.log(self._picked(y_true, y_pred))
+    
+    def loss_prime(self, y_true, y_pred):
+        gradient = self._gradient_buffer(y_pred)
+        gradient.fill(0)
+        gradient[self._sample_rows(len(y_true)), y_true] = -1 / self._picked(y_true, y_pred)
+        return gradient
+    
+class SparseBinaryCrossEntropy(SparseLoss):
+    """Binary cross entropy where the label is the index of the one output that should be 1, every other output should be 0"""
+    _verbose_name = "sparse binary cross entropy"
+    
+    def __init__(self) -> None:
+        super().__init__()
+    
+    def loss(self, y_true, y_pred):
+        loss = -np.log(1 - y_pred)
+        rows = self._sample_rows(len(y_true))
+        loss[rows, y_true] = -np.log(y_pred[rows, y_true])
+        return loss
+    
+    def loss_prime(self, y_true, y_pred):
+        gradient = self._gradient_buffer(y_pred)
+        np.subtract(1, y_pred, out=gradient)
+        np.reciprocal(gradient, out=gradient)
+        rows = self._sample_rows(len(y_true))
+        gradient[rows, y_true] = -1 / y_pred[rows, y_true]
+        return gradient
+    
+class SoftmaxCategoricalCrossEntropy(Loss):
+    """
+    Softmax and Categorical cross entropy fused together, y_pred are the logits from before the softmax.
+    Gradient is just softmax - y_true, which is faster and more stable than going back through both separately.
+    A network ending in Softmax with CategoricalCrossEntropy uses this automatically when training.
+    """
+    _verbose_name = "softmax categorical cross entropy"
+    
+    def __init__(self, categorical_labels: bool = None) -> None:
+        super().__init__(categorical_labels)
+    
+    def _log_softmax(self, logits: np.ndarray) -> np.ndarray:
+        shifted = logits - np.max(logits, axis=-1, keepdims=True)
+        shifted -= np.log(np.sum(np.exp(shifted), axis=-1, keepdims=True))
+        return shifted
+    
+    def loss(self, y_true, y_pred):
+        return -np.sum(y_true * self._log_softmax(y_pred), axis=1)
+    
+    def loss_prime(self, y_true, y_pred):
+        return np.exp(self._log_softmax(y_pred)) - y_true
+    
+    def forward_backward(self, y_true, y_pred):
+        log_probabilities = self._log_softmax(y_pred)
+        samples = np.size(y_pred, 0)
+        
+        if self._uses_categorical_labels(y_true):
+            rows = np.arange(samples)
+            loss = -np.mean(log_probabilities[rows, y_true])
+            gradient = np.exp(log_probabilities, out=log_probabilities)
+            gradient[rows, y_true] -= 1
+        else:
+            loss = np.mean(-np.sum(y_true * log_probabilities, axis=1))
+            gradient = np.exp(log_probabilities, out=log_probabilities)
+            gradient -= y_true
+        
+        gradient /= samples
+        return loss, gradient
@@ -1,3 +1,15 @@
 from .network import Network
+from .checkpoint import CheckpointManager
+from .profiler import Profiler
+from .quantization import quantize, quantization_report
+from .generator import SlidingWindowGenerator, sample_tokens
 
-__all__ = [Network]
\ No newline at end of file
+__all__ = ["Network", "CheckpointManager", "Profiler", "quantize", "quantization_report", "SlidingWindowGenerator", "sample_tokens", "DataParallel"]
+
+
+def __getattr__(name: str):
+    # multiprocessing is only imported when training in parallel
+    if name == "DataParallel":
+        from .parallel import DataParallel
+        return DataParallel
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,155 @@
+import os
+import random
+import re
+import threading
+
+import numpy as np
+
+from neural_network.data.storage import load_arrays, read_header, save_arrays
+from neural_network.network.model_file import check_layers, layer_spec
+
+FORMAT = "neural_network.checkpoint"
+VERSION = 1
+SUFFIX = ".ckpt"
+
+
+class CheckpointManager:
+    """
+    Saves everything needed to continue a training run: parameters, optimizer state, numpy and python random state, the
+    step (like round or epoch) and any extra JSON serializable values. save copies the state in memory right away and
+    writes it on a background thread, so training goes on while the file is written. Files are written next to their
+    final name and renamed into place, so a crash never leaves a half written checkpoint, only the newest keep are kept.
+    Files use the array format from neural_network.data.storage.
+
+    numpy's global random state only continues exactly if nothing else draws from it at the same time, like a prefetch
+    thread making batches, since then how many numbers were taken by the time of save depends on timing. Code like that
+    should use its own numpy Generator, passed in generators by name so its state is saved and restored too.
+    """
+
+    def __init__(self, directory, network, optimizer=None, keep: int = 3, prefix: str = "checkpoint", generators: dict[str, np.random.Generator] = None) -> None:
+        if keep < 1:
+            raise ValueError(f"keep must be at least 1, got {keep}")
+
+        self.directory = str(directory)
+        self.network = network
+        self.optimizer = optimizer
+        self.keep = keep
+        self.prefix = prefix
+        self.generators = generators or {}
+
+        self._pattern = re.compile(rf"{re.escape(prefix)}-(\d+){re.escape(SUFFIX)}")
+        self._writer = None
+        self._error = None
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __enter__(self) -> "CheckpointManager":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.wait()
+
+    def checkpoints(self) -> list[str]:
+        """Paths of saved checkpoints, oldest first"""
+        steps = []
+        for name in os.listdir(self.directory):
+            match = self._pattern.fullmatch(name)
+            if match:
+                steps.append((int(match.group(1)), name))
+        return [os.path.join(self.directory, name) for _, name in sorted(steps)]
+
+    def latest(self) -> str:
+        """Path of the newest checkpoint, or None if there are none"""
+        checkpoints = self.checkpoints()
+        return checkpoints[-1] if checkpoints else None
+
+    def save(self, step: int, extra: dict = None) -> None:
+        """Snapshot the run now and write it in the background, waits for the last save to finish first"""
+        self.wait()
+
+        arrays = {}
+        for index, layer in enumerate(self.network.layers):
+            for name, param in layer.parameters().items():
+                arrays[f"model.{index}.{name}"] = param.copy()
+        if self.optimizer is not None:
+            for name, array in self.optimizer.get_state(self.network.layers).items():
+                arrays[f"optimizer.{name}"] = array
+
+        bit_generator, keys, position, has_gauss, cached_gaussian = np.random.get_state()
+        arrays["numpy_random.keys"] = keys.copy()
+
+        python_version, python_state, python_gauss = random.getstate()
+
+        metadata = {
+            "format": FORMAT,
+            "version": VERSION,
+            "step": step,
+            "extra": extra or {},
+            "layers": [layer_spec(layer) for layer in self.network.layers],
+            "numpy_random": {"bit_generator": bit_generator, "position": position, "has_gauss": has_gauss, "cached_gaussian": cached_gaussian},
+            "python_random": {"version": python_version, "state": list(python_state), "gauss": python_gauss},
+            "generators": {name: generator.bit_generator.state for name, generator in self.generators.items()},
+        }
+
+        path = os.path.join(self.directory, f"{self.prefix}-{step:010d}{SUFFIX}")
+        self._writer = threading.Thread(target=self._write, args=(path, arrays, metadata), daemon=True)
+        self._writer.start()
+
+    def _write(self, path: str, arrays: dict, metadata: dict) -> None:
+        try:
+            temporary = path + ".tmp"
+            save_arrays(temporary, arrays, metadata)
+            with open(temporary, "rb+") as file:
+                os.fsync(file.fileno())
+            os.replace(temporary, path)
+
+            for old in self.checkpoints()[:-self.keep]:
+                os.remove(old)
+        except BaseException as error:
+            self._error = error
+
+    def wait(self) -> None:
+        """Block until the last save is written, raises any error from writing it"""
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def restore(self, path: str = None) -> dict:
+        """
+        Load a checkpoint (the newest if path is not given) into the network, optimizer and random generators.
+        Returns {"step": step, "extra": extra} to continue from, or None if there is no checkpoint.
+        """
+        self.wait()
+
+        path = path or self.latest()
+        if path is None:
+            return None
+
+        if read_header(path)["metadata"].get("format") != FORMAT:
+            raise ValueError(f"{path} is not a checkpoint")
+        arrays, metadata = load_arrays(path, mode=None)
+
+        check_layers(path, [spec["type"] for spec in metadata["layers"]], self.network.layers)
+        missing = self.generators.keys() - metadata.get("generators", {}).keys()
+        if missing:
+            raise ValueError(f"{path} has no state for generators {sorted(missing)}")
+
+        for index, layer in enumerate(self.network.layers):
+            layer.set_parameters({name: arrays[f"model.{index}.{name}"] for name in layer.parameters()})
+
+        if self.optimizer is not None:
+            self.optimizer.set_state(self.network.layers, {name.removeprefix("optimizer."): array for name, array in arrays.items() if name.startswith("optimizer.")})
+
+        numpy_random = metadata["numpy_random"]
+        np.random.set_state((numpy_random["bit_generator"], arrays["numpy_random.keys"], numpy_random["position"], numpy_random["has_gauss"], numpy_random["cached_gaussian"]))
+
+        python_random = metadata["python_random"]
+        random.setstate((python_random["version"], tuple(python_random["state"]), python_random["gauss"]))
+
+        for name, generator in self.generators.items():
+            generator.bit_generator.state = metadata["generators"][name]
+
+        return {"step": metadata["step"], "extra": metadata["extra"]}
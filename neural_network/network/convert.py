@@ -0,0 +1,50 @@
+"""
+Convert networks pickled before the current file format to network files.
+
+    python -m neural_network.network.convert pong/player.py:AIPaddle.DEFAULT_NETWORK pong/models/default.pkl
+
+Old files have no architecture, so the network they were saved from is given as a python file and the name of the
+network in it. The file is imported with its folder on the path, like when it is run, so it needs whatever the
+project needs. The network file is written next to each pickle with the .nnm suffix.
+"""
+
+import argparse
+import importlib.util
+import pathlib
+import sys
+
+from neural_network.network.model_file import convert_pickle
+
+
+def load_network(reference: str):
+    """The network at "path/to/file.py:name.attribute" """
+    file_path, _, name = reference.partition(":")
+    if not name:
+        raise ValueError(f"Expected path/to/file.py:name, got {reference}")
+
+    file_path = pathlib.Path(file_path).absolute()
+    sys.path.insert(0, str(file_path.parent))
+    spec = importlib.util.spec_from_file_location(file_path.stem, file_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[file_path.stem] = module
+    spec.loader.exec_module(module)
+
+    value = module
+    for attribute in name.split("."):
+        value = getattr(value, attribute)
+    return value
+
+
+def main(argv: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Convert pickled networks from before the current file format to network files")
+    parser.add_argument("network", help="python file and name of the network the pickles were saved from, like pong/player.py:AIPaddle.DEFAULT_NETWORK")
+    parser.add_argument("pickles", nargs="+", help="pickled network files to convert")
+    args = parser.parse_args(argv)
+
+    network = load_network(args.network)
+    for path in args.pickles:
+        print(f"Converted {path} to {convert_pickle(path, network.layers, network.loss, network.dtype)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import numpy as np
+
+from neural_network.layers import SparseDense
+
+
+def sample_tokens(probabilities: np.ndarray, top_k: int = None, temperature: float = 1.0, rng=None) -> np.ndarray:
+    """
+    Pick one token for each row of probabilities, from only its top_k most likely (all if None).
+    temperature below 1 makes likely tokens more likely, above 1 evens them out, 0 always picks the most likely and
+    infinity picks from the top_k evenly.
+    rng is a numpy Generator, or a list of one for each row so every row gets the same picks however many are sampled
+    together. numpy's global random state is used if it is None.
+    """
+    rows, vocabulary = probabilities.shape
+    if temperature < 0:
+        raise ValueError(f"temperature can not be negative, got {temperature}")
+    if temperature == 0 or top_k == 1:
+        return np.argmax(probabilities, axis=1)
+
+    if top_k is None or top_k >= vocabulary:
+        candidates = np.broadcast_to(np.arange(vocabulary), (rows, vocabulary))
+        weights = probabilities.astype(np.float64)
+    else:
+        candidates = np.argpartition(probabilities, -top_k, axis=1)[:, -top_k:]
+        weights = np.take_along_axis(probabilities, candidates, axis=1).astype(np.float64)
+
+    if temperature != 1:
+        # same as dividing the logits by temperature before softmax
+        np.log(np.maximum(weights, np.finfo(np.float64).tiny), out=weights)
+        weights /= temperature
+        weights -= np.max(weights, axis=1, keepdims=True)
+        np.exp(weights, out=weights)
+
+    totals = np.cumsum(weights, axis=1)
+    if rng is None or isinstance(rng, np.random.Generator):
+        picks = (np.random if rng is None else rng).random((rows, 1))
+    else:
+        if len(rng) != rows:
+            raise ValueError(f"Expected a Generator for each of the {rows} rows, got {len(rng)}")
+        picks = np.array([[row_rng.random()] for row_rng in rng])
+    picks *= totals[:, -1:]
+    chosen = np.minimum(np.sum(totals <= picks, axis=1), candidates.shape[1] - 1)
+    return candidates[np.arange(rows), chosen]
+
+
+class SlidingWindowGenerator:
+    """
+    Runs a network over a window of the last window tokens of many sequences at once, one token at a time, for
+    generating text. The network has to start with SparseDense(window * vocabulary, hidden) fed the index
+    position * vocabulary + token for each token in the window (-1 for empty positions before the start), like the
+    character network. All sequences go through the network together as one batch, so a few dozen take about as long as one.
+
+    Every position has its own first layer rows and every token moves one position each step, so the first layer can
+    not be updated by only taking out the row of the token leaving the window and adding the one coming in, all window
+    rows change. Instead, when a token comes in the rows for every position it will be at are added to the first layer
+    sums of the steps it will be seen in. That is still window rows of hidden values added per token, the same
+    O(window * hidden) as SparseDense.forward on the whole window. What it saves is everything around that: the window
+    is not encoded again from the message, nothing before the window is kept, and the layers after the first run on
+    reused buffers. Those deeper layers are most of the work for the character network.
+    """
+
+    def __init__(self, network, window: int, vocabulary: int) -> None:
+        first = network.layers[0] if network.layers else None
+        if not isinstance(first, SparseDense) or first.weights.shape[0] != window * vocabulary:
+            raise ValueError(f"Network has to start with SparseDense({window * vocabulary}, n), got {first}")
+
+        self.network = network
+        self.window = window
+        self.vocabulary = vocabulary
+
+        # a token that comes in now is at the last position, then one position earlier each step
+        self._positions = np.arange(window - 1, -1, -1)
+        self._offsets = np.arange(window)
+        self.reset([[]])
+
+    @property
+    def batch_size(self) -> int:
+        return len(self._heads)
+
+    def reset(self, sequences: list) -> None:
+        """Start over with one sequence for each of sequences (lists of tokens, only the last window of each matter)"""
+        batch_size = len(sequences)
+        hidden = self.network.layers[0].weights.shape[1]
+        dtype = self.network.dtype
+
+        # sums[i, (heads[i] + k) % window] is the first layer sum (without biases) of sequence i for k steps from now
+        self._sums = np.zeros((batch_size, self.window, hidden), dtype=dtype)
+        self._heads = np.zeros(batch_size, dtype=np.intp)
+
+        shapes = [(hidden,)]
+        for layer in self.network.layers[1:]:
+            shapes.append(layer.output_shape(shapes[-1]))
+        self._outputs = [np.empty((batch_size, *shape), dtype=dtype) for shape in shapes]
+
+        # every sequence has its own head, so shorter ones just stop being pushed once they run out
+        tails = [list(sequence)[-self.window:] for sequence in sequences]
+        for step in range(max(map(len, tails), default=0)):
+            active = np.array([step < len(tail) for tail in tails])
+            tokens = np.array([tail[step] if step < len(tail) else 0 for tail in tails], dtype=np.intp)
+            self.push(tokens, active)
+
+    def push(self, tokens: np.ndarray, active: np.ndarray = None) -> None:
+        """Move the window of each sequence one token on with its token as the newest, only for sequences where active is True"""
+        tokens = np.asarray(tokens)
+        if tokens.shape != (self.batch_size,):
+            raise ValueError(f"Expected one token for each of the {self.batch_size} sequences, got shape {tokens.shape}")
+        rows = np.arange(self.batch_size) if active is None else np.flatnonzero(active)
+        tokens = tokens[rows]
+        if np.any((tokens < 0) | (tokens >= self.vocabulary)):
+            raise ValueError(f"tokens have to be between 0 and {self.vocabulary - 1}")
+
+        # the sums for this step are done, its slot becomes the last step this token is seen in
+        self._sums[rows, self._heads[rows]] = 0
+        self._heads[rows] = (self._heads[rows] + 1) % self.window
+
+        weights = self.network.layers[0].weights
+        slots = (self._heads[rows, None] + self._offsets) % self.window
+        self._sums[rows[:, None], slots] += weights[self._positions * self.vocabulary + tokens[:, None]]
+
+    def probabilities(self) -> np.ndarray:
+        """Output of the network for the current window of every sequence, a row for each, overwritten by the next call"""
+        layers = self.network.layers
+        outputs = np.add(self._sums[np.arange(self.batch_size), self._heads], layers[0].biases, out=self._outputs[0])
+        for layer, out in zip(layers[1:], self._outputs[1:]):
+            outputs = layer.forward_into(outputs, out)
+        return outputs
+
+    def step(self, tokens: np.ndarray, active: np.ndarray = None) -> np.ndarray:
+        """push tokens and return the probabilities after them"""
+        self.push(tokens, active)
+        return self.probabilities()
@@ -0,0 +1,120 @@
+"""
+Network files, the array file format from neural_network.data.storage with the architecture in its metadata.
+
+The metadata looks like:
+    {"format": "neural_network.model", "version": 1, "dtype": "<f4",
+     "layers": [{"type": "Dense", "config": {"n_inputs": 784, "n_outputs": 256}, "parameters": ["weights", "biases"]}, ...],
+     "loss": {"type": "CategoricalCrossEntropy", "config": {"categorical_labels": true}}}
+and the parameter of layer i called name is stored as the array "i.name", so every tensor starts on a 64 byte boundary
+and can be memory mapped straight into the layer. Layers are made again by calling their class with config as arguments.
+"""
+
+import inspect
+import pickle
+
+import numpy as np
+
+from neural_network.activations import activations as activation_module
+from neural_network.layers import layers as layer_module
+from neural_network.losses import losses as loss_module
+from neural_network.base import BaseLayer
+from neural_network.data.storage import load_arrays, save_arrays
+
+FORMAT = "neural_network.model"
+VERSION = 1
+SUFFIX = ".nnm"
+LEGACY_SUFFIX = ".pkl"
+
+
+def _layer_classes() -> dict[str, type]:
+    classes = {}
+    for module in (layer_module, activation_module, loss_module):
+        for name, value in vars(module).items():
+            if inspect.isclass(value) and issubclass(value, BaseLayer) and not inspect.isabstract(value):
+                classes[name] = value
+    return classes
+
+
+def layer_spec(layer: BaseLayer) -> dict:
+    """JSON serializable description of layer that make_layer can build it again from"""
+    return {"type": type(layer).__name__, "config": layer.get_config()}
+
+
+def make_layer(spec: dict) -> BaseLayer:
+    classes = _layer_classes()
+    if spec["type"] not in classes:
+        raise ValueError(f"Unknown layer type {spec['type']}")
+    return classes[spec["type"]](**spec["config"])
+
+
+def model_path(file_path) -> str:
+    """
+    file_path with the model suffix added, or in place of the old .pkl suffix. Only those two are treated as suffixes,
+    anything else after a dot is part of the name, like char-network-v1.5 or model.best.
+    """
+    file_path = str(file_path)
+    if file_path.endswith(SUFFIX):
+        return file_path
+    return file_path.removesuffix(LEGACY_SUFFIX) + SUFFIX
+
+
+def save_model(file_path, layers: list[BaseLayer], loss: BaseLayer, dtype: np.dtype) -> None:
+    specs = []
+    arrays = {}
+    for index, layer in enumerate(layers):
+        parameters = layer.parameters()
+        specs.append({**layer_spec(layer), "parameters": list(parameters)})
+        for name, array in parameters.items():
+            arrays[f"{index}.{name}"] = array
+
+    metadata = {"format": FORMAT, "version": VERSION, "dtype": np.dtype(dtype).str, "layers": specs, "loss": layer_spec(loss)}
+    save_arrays(model_path(file_path), arrays, metadata)
+
+
+def read_model(file_path, mode: str = "c") -> tuple[dict, list[dict[str, np.ndarray]]]:
+    """
+    Returns (metadata, parameters for each layer). mode is passed to load_arrays, by default arrays are memory mapped
+    copy on write so nothing is read until used and changes (like training) stay in memory, "r" to make them read only.
+    """
+    arrays, metadata = load_arrays(model_path(file_path), mode)
+
+    if metadata.get("format") != FORMAT:
+        raise ValueError(f"{file_path} is not a network file")
+    if metadata["version"] > VERSION:
+        raise ValueError(f"{file_path} has version {metadata['version']}, only up to {VERSION} is supported")
+
+    # plain arrays that share the mapped memory, so layers do not carry memmap around
+    parameters = [{name: np.asarray(arrays[f"{index}.{name}"]) for name in spec["parameters"]} for index, spec in enumerate(metadata["layers"])]
+    return metadata, parameters
+
+
+def check_layers(file_path, saved_types: list[str], layers: list[BaseLayer]) -> None:
+    """Raise ValueError unless every layer is the type saved in the file or made from it (like SparseDense from Dense)"""
+    matches = len(saved_types) == len(layers) and all(
+        saved_type in (base.__name__ for base in type(layer).__mro__) for saved_type, layer in zip(saved_types, layers))
+    if not matches:
+        raise ValueError(f"{file_path} has layers {saved_types}, network has {[type(layer).__name__ for layer in layers]}")
+
+
+def load_parameters(file_path, layers: list[BaseLayer], mode: str = "c") -> None:
+    """Set parameters of already made layers from a network file, raises ValueError if the layers do not match the file"""
+    metadata, parameters = read_model(file_path, mode)
+
+    check_layers(file_path, [spec["type"] for spec in metadata["layers"]], layers)
+    for layer, arrays in zip(layers, parameters):
+        layer.set_parameters(arrays)
+
+
+def convert_pickle(file_path, layers: list[BaseLayer], loss: BaseLayer, dtype: np.dtype) -> str:
+    """
+    Convert a pickled file from before this format (made by Network.dump) to a network file next to it, returns its path.
+    Old files have no architecture, so the layers it was saved from have to be given. They are loaded with its parameters.
+    """
+    file_path = str(file_path).removesuffix(LEGACY_SUFFIX)
+    with open(file_path + LEGACY_SUFFIX, "rb") as file:
+        saved = pickle.load(file)
+    for layer, saved_layer_data in zip(layers, saved):
+        layer.load_params(saved_layer_data)
+
+    save_model(file_path, layers, loss, dtype)
+    return model_path(file_path)
@@ -1,105 +1,367 @@
+import itertools
+import os
 import pickle
 
 import numpy as np
 
-from neural_network.losses.losses import Loss
+from neural_network.losses.losses import Loss, CategoricalCrossEntropy, SparseCategoricalCrossEntropy, SoftmaxCategoricalCrossEntropy
+from neural_network.activations.activations import Softmax
 from neural_network.base import BaseLayer
+from neural_network.data.sampler import BatchSampler
+from neural_network.data.prefetch import Prefetcher
+from neural_network.network.summary import NetworkSummary
+from neural_network.network.model_file import LEGACY_SUFFIX, load_parameters, make_layer, model_path, read_model, save_model
+from neural_network.optimizers.optimizers import Optimizer, SGD
 
 
-# at some point add compile step where optimizations could be made and Dense Layers could find how many inputs they have
+# compile step could also let Dense Layers find how many inputs they have
 #  _init_params should also return self and any other layers to add (for example Dense could return itself and an activation)
 # also save _init_params for model save / load
 
-def n_split_array(arr, n_size, *, keep_extra=True):
-    """split arr into chunks of size n with extra added on end if keep_extra is true"""
-    if n_size is None: return arr
-        
-    if len(arr) < n_size:
-        return [arr] if keep_extra else []
+_LOG_EVERY_N_BATCHES = 100
+
+
+def _workspace_plan(layers: list[BaseLayer], input_shape: tuple) -> tuple[list[tuple], list[int], int]:
+    """
+    Shape of the input and every layers output, which layers output buffer each layer writes into (None if it returns a view
+    of its input, the one before it if it works in place) and the index of the first layer with parameters
+    """
+    shapes = [tuple(input_shape)]
+    for layer in layers:
+        shapes.append(layer.output_shape(shapes[-1]))
     
-    div, extra = divmod(len(arr), n_size)
+    # activations that back propagate from their output overwrite their input in place, it is not needed anymore
+    # (unless the layer before also back propagates from its output, which is that input)
+    owners = []
+    for index, (layer, shape) in enumerate(zip(layers, shapes[1:])):
+        if not layer._allocates_output:
+            owners.append(None)
+        elif (layer._prime_from_output and index > 0 and not layers[index - 1]._prime_from_output
+              and owners[-1] is not None and shapes[index] == shape):
+            owners.append(owners[-1])
+        else:
+            owners.append(index)
     
-    a, b = np.split(arr, [len(arr) - extra])
+    # nothing before the first layer with parameters needs a gradient
+    trainable = [index for index, layer in enumerate(layers) if layer.parameters()]
+    first_trainable = trainable[0] if trainable else len(layers)
     
-    return np.array_split(a, div) + ([b] if (len(b) and keep_extra) else [])
-
+    return shapes, owners, first_trainable
 
-def same_shuffle(*arrays):
-    """shuffle 2 arrays """
-    order = np.arange(np.size(arrays[0], 0))
-    np.random.shuffle(order)
-    return tuple(array[order] for array in arrays)
+class _Workspace:
+    """Preallocated forward and backward buffers for training layers with up to batch_size samples"""
+    
+    def __init__(self, layers: list[BaseLayer], input_shape: tuple, batch_size: int, dtype: np.dtype) -> None:
+        self.layers = layers
+        self.batch_size = batch_size
+        
+        self.shapes, owners, self.first_trainable = _workspace_plan(layers, input_shape)
+        
+        buffers = {}
+        self.outputs = []
+        for owner in owners:
+            if owner is not None and owner not in buffers:
+                buffers[owner] = np.empty((batch_size, *self.shapes[owner + 1]), dtype=dtype)
+            self.outputs.append(None if owner is None else buffers[owner])
+        self.activations = [None] * (len(layers) + 1)
+        
+        self.input_gradients = [np.empty((batch_size, *shape), dtype=dtype) if index > self.first_trainable else None
+                                for index, shape in enumerate(self.shapes[:-1])]
 
 class Network:
-    def __init__(self, layers: list[BaseLayer], loss: Loss, preprocess: list = []) -> None:
+    def __init__(self, layers: list[BaseLayer], loss: Loss, preprocess: list = [], dtype=np.float64) -> None:
         self.layers = layers
         self.loss = loss
         self.reprocesses = preprocess
-    
-    def compute(self, inputs: np.ndarray) -> np.ndarray:
+        self.dtype = np.dtype(dtype)
         
+        for layer in self.layers:
+            layer.set_dtype(self.dtype)
+        self.loss.set_dtype(self.dtype)
+        
+        self._workspace = None
+        self._predict_buffers = None
+        self._parallel = None
+        self._profiler = None
+    
+    def _as_dtype(self, array: np.ndarray) -> np.ndarray:
+        """Cast floating point data to the networks dtype, integer labels are left alone"""
+        array = np.asarray(array)
+        if np.issubdtype(array.dtype, np.integer) or np.issubdtype(array.dtype, np.bool_):
+            return array
+        return array.astype(self.dtype, copy=False)
+    
+    def _training_head(self) -> tuple[list[BaseLayer], Loss]:
+        """Layers and loss used for training, a final Softmax is fused into cross entropy so it is skipped"""
+        if self.layers and isinstance(self.layers[-1], Softmax):
+            if isinstance(self.loss, SoftmaxCategoricalCrossEntropy):
+                return self.layers[:-1], self.loss
+            if type(self.loss) is CategoricalCrossEntropy:
+                return self.layers[:-1], SoftmaxCategoricalCrossEntropy(self.loss.categorical_labels)
+            if type(self.loss) is SparseCategoricalCrossEntropy:
+                return self.layers[:-1], SoftmaxCategoricalCrossEntropy(categorical_labels=True)
+        return self.layers, self.loss
+    
+    def compile(self, input_shape: tuple, batch_size: int = 32) -> None:
+        """
+        Check that every layer fits the output of the one before it, and preallocate all training buffers for batch_size.
+        input_shape is the shape of one sample after preprocessing. Raises ValueError if the layers do not fit together.
+        """
+        layers, _ = self._training_head()
+        self._workspace = _Workspace(layers, input_shape, batch_size, self.dtype)
+    
+    def summary(self, input_shape: tuple, batch_size: int = 32, input_dtype=None) -> NetworkSummary:
+        """
+        Parameters, FLOPs and memory for training and inference on batches of batch_size samples of input_shape, print it for a table.
+        input_dtype defaults to what the network turns inputs into, the networks dtype or integer indexes for a first layer like SparseDense.
+        """
+        return NetworkSummary(self, input_shape, batch_size, input_dtype)
+    
+    def _prepare_inputs(self, inputs: np.ndarray) -> np.ndarray:
         for proc in self.reprocesses:
             inputs = proc(inputs)
+        if self.layers and self.layers[0]._index_inputs:
+            return np.asarray(inputs)
+        return np.asarray(inputs, dtype=self.dtype)
+    
+    def _prepare_batch(self, batch: tuple[np.ndarray, np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+        x_batch, y_batch = batch
+        return self._prepare_inputs(x_batch), self._as_dtype(y_batch)
+    
+    def compute(self, inputs: np.ndarray) -> np.ndarray:
+        inputs = self._prepare_inputs(inputs)
         
         for layer in self.layers:
             inputs = layer.forward(inputs)
         return inputs
     
     
-    def train(self, x: np.ndarray, y: np.ndarray, learning_rate: float = 0.001, batch_size: int = 32, epochs: int = 1, shuffle: bool = True, logging = True):
-
-        for proc in self.reprocesses:
-            x = proc(x)
+    def predict(self, inputs: np.ndarray, batch_size: int = 1024, out: np.ndarray = None) -> np.ndarray:
+        """
+        Same result as compute, but inputs go through batch_size samples at a time using two reused buffers,
+        so big inputs never create full size intermediate arrays. The result is written into out if it is given.
+        """
+        samples = len(inputs)
+        if samples == 0:
+            result = self.compute(inputs)
+            if out is None:
+                return result
+            if out.shape != result.shape:
+                raise ValueError(f"out should have shape {result.shape}, got {out.shape}")
+            return out
+        
+        for start in range(0, samples, batch_size):
+            chunk = self._prepare_inputs(inputs[start:start + batch_size])
+            
+            if start == 0:
+                shapes = [chunk.shape[1:]]
+                for layer in self.layers:
+                    shapes.append(layer.output_shape(shapes[-1]))
+                buffers = self._inference_buffers(max(int(np.prod(shape)) for shape in shapes[1:]) * batch_size)
+                
+                if out is None:
+                    out = np.empty((samples, *shapes[-1]), dtype=self.dtype)
+                elif out.shape != (samples, *shapes[-1]):
+                    raise ValueError(f"out should have shape {(samples, *shapes[-1])}, got {out.shape}")
+            
+            # ping pong between the two buffers, layers that return a view keep their input's buffer
+            current = None
+            for layer, shape in zip(self.layers, shapes[1:]):
+                if layer._allocates_output:
+                    current = 0 if current != 0 else 1
+                    chunk = layer.forward_into(chunk, buffers[current][:len(chunk) * int(np.prod(shape))].reshape(len(chunk), *shape))
+                else:
+                    chunk = layer.forward(chunk)
+            
+            out[start:start + len(chunk)] = chunk
+        
+        return out
+    
+    def _inference_buffers(self, size: int) -> tuple[np.ndarray, np.ndarray]:
+        buffers = self._predict_buffers
+        if buffers is None or buffers[0].size < size or buffers[0].dtype != self.dtype:
+            buffers = self._predict_buffers = (np.empty(size, dtype=self.dtype), np.empty(size, dtype=self.dtype))
+        return buffers
+    
+    def train(self, x: np.ndarray, y: np.ndarray, learning_rate: float = 0.001, batch_size: int = 32, epochs: int = 1, shuffle: bool = True, logging = True, optimizer: Optimizer = None, prefetch: int = 0):
+        """
+        Train with back propagation, optimizer defaults to plain SGD. Pass the same optimizer to each call to keep its state.
+        If x is memory mapped (like from neural_network.data.load_arrays) batches are read and preprocessed from disk as needed.
+        prefetch is how many batches to read and preprocess ahead in a background thread while training, 0 to preprocess all of x first (unless it is on disk).
+        learning_rate can also be a function taking the step number and returning the learning rate.
+        """
+        lazy = isinstance(x, np.memmap) or prefetch > 0
+        if not lazy:
+            x, y = self._prepare_inputs(x), self._as_dtype(y)
+        
+        # one batch of everything is the same in any order. Prefetched batches are kept until used, so each needs its own buffer
+        sampler = BatchSampler((x, y), batch_size, shuffle=shuffle and batch_size is not None, n_buffers=prefetch + 2 if prefetch else 1)
+        
+        def epoch_batches():
+            if not lazy:
+                return iter(sampler)
+            if prefetch > 0:
+                return iter(Prefetcher(sampler, self._prepare_batch, prefetch=prefetch))
+            return map(self._prepare_batch, sampler)
+        
+        self._fit(epoch_batches, len(sampler), epochs, learning_rate, logging, optimizer)
+    
+    def train_stream(self, batches, steps: int = None, epochs: int = 1, learning_rate: float = 0.001, logging = True, optimizer: Optimizer = None, prefetch: int = 0):
+        """
+        Train on (x_batch, y_batch) pairs as they come from batches, so data can be made while training without keeping all of it.
+        batches is any iterable of batches, or a function returning a new iterable each epoch (needed for more than one epoch of a generator).
+        steps is how many batches are used each epoch, if not given then until batches runs out.
+        prefetch is how many batches to make and preprocess ahead in a background thread while training.
+        learning_rate can be a number or a function taking the step number (counted over all epochs) and returning the learning rate.
+        """
+        if not callable(batches) and iter(batches) is batches and epochs > 1:
+            raise ValueError("A single use iterator can not be used for more than one epoch, pass a function that returns a new one instead")
+        
+        def epoch_source():
+            source = batches() if callable(batches) else batches
+            if steps is not None:
+                source = itertools.islice(source, steps)
+            return source
+        
+        def epoch_batches():
+            if prefetch > 0:
+                return iter(Prefetcher(epoch_source, self._prepare_batch, prefetch=prefetch))
+            return map(self._prepare_batch, epoch_source())
+        
+        if steps is None and not callable(batches) and hasattr(batches, "__len__"):
+            steps = len(batches)
+        self._fit(epoch_batches, steps, epochs, learning_rate, logging, optimizer)
+    
+    def _fit(self, epoch_batches, n_batches: int, epochs: int, learning_rate, logging: bool, optimizer: Optimizer) -> None:
+        """Training loop shared by train and train_stream, epoch_batches is called once per epoch for its prepared batches"""
+        if optimizer is None:
+            optimizer = SGD()
+        
+        layers, loss_function = self._training_head()
+        workspace = self._workspace
+        parallel = self._parallel
+        profiler = self._profiler
+        if profiler is not None:
+            profiler.wrap_loss(loss_function)
             
         max_str_len = 0
         
         loss = None
         
         last_percent_complete = -1
+        
+        step = 0
          
         for epoch in range(epochs):
-            if shuffle:
-                x, y = same_shuffle(x, y)
-            x_split, y_split = n_split_array(x, batch_size), n_split_array(y, batch_size)
-            for batch, (x_batch, y_batch) in enumerate(zip(x_split, y_split)):                      
-                zs = [x_batch]
-                for layer in self.layers:
-                    activation = layer.forward(zs[-1])
-                    zs.append(activation)
+            batches = epoch_batches() if profiler is None else profiler.timed_batches(epoch_batches())
+            for batch, (x_batch, y_batch) in enumerate(batches):
+                step_learning_rate = learning_rate(step) if callable(learning_rate) else learning_rate
+                if parallel is not None:
+                    train_batch, arguments = parallel.train_batch, (x_batch, y_batch, step_learning_rate, optimizer)
+                else:
+                    train_batch, arguments = self._train_batch, (x_batch, y_batch, layers, loss_function, step_learning_rate, optimizer, workspace)
+                loss = train_batch(*arguments) if profiler is None else profiler.time_step(train_batch, *arguments)
+                step += 1
                     
                 # todo add more logging options and make it so it ends at 100 and batch at 50 by +1
-                    
-                output = zs.pop()
-                                
-                loss = self.loss.forward(y_batch, output)
                 
-                percent_complete = int((batch + len(x_split) * epoch) / (len(x_split) * epochs) * 100)
-                if logging and (percent_complete > last_percent_complete or batch == 0):
+                if not logging:
+                    continue
+                
+                if n_batches is None:
+                    # length is not known, so log every so many batches instead of every percent
+                    if batch % _LOG_EVERY_N_BATCHES == 0:
+                        message = f"{epoch=}, {batch=}, {loss=}"
+                        max_str_len = max(max_str_len, len(message))
+                        print(message.ljust(max_str_len), end=("\n" if batch == 0 else "\r"))
+                    continue
+                
+                percent_complete = int((batch + n_batches * epoch) / (n_batches * epochs) * 100)
+                if percent_complete > last_percent_complete or batch == 0:
                     last_percent_complete = percent_complete
                     message = f"{percent_complete}% complete. {epoch=}, {batch=}, {loss=}"
                     max_str_len = max(max_str_len, len(message))
                     print(message.ljust(max_str_len), end=("\n" if batch == 0 else "\r"))
-                                   
-                grad = self.loss.backward(y_batch, output)
-                
-                for layer, activation in zip(reversed(self.layers), reversed(zs)):
-                    grad = layer.backward(activation, grad, learning_rate)
             
         if logging: print(f"100% complete. finished, {loss=}".ljust(max_str_len))
+    
+    def _train_batch(self, x_batch, y_batch, layers, loss_function, learning_rate, optimizer, workspace=None) -> float:
+        """Forward and back propagate one batch, returns its loss"""
+        if workspace is None:
+            zs = [x_batch]
+            for index, layer in enumerate(layers):
+                zs.append(layer.forward(zs[-1]))
+                # the input is not needed for the backward, unless it is the output another activation back propagates from
+                if layer._prime_from_output and (index == 0 or not layers[index - 1]._prime_from_output):
+                    zs[-2] = None
+            
+            loss, grad = loss_function.forward_backward(y_batch, zs[-1])
+            
+            for index in range(len(layers) - 1, -1, -1):
+                layer = layers[index]
+                if layer._prime_from_output:
+                    grad = layer.backward_from_output(zs[index + 1], grad)
+                else:
+                    grad = layer.backward(zs[index], grad, learning_rate, optimizer)
+            return loss
+        
+        if x_batch.shape[1:] != workspace.shapes[0]:
+            raise ValueError(f"Network was compiled for input shape {workspace.shapes[0]}, got {x_batch.shape[1:]}")
+        if len(x_batch) > workspace.batch_size:
+            raise ValueError(f"Network was compiled for batch size {workspace.batch_size}, got a batch of {len(x_batch)}")
+        
+        samples = len(x_batch)
+        activations = workspace.activations
+        
+        activations[0] = x_batch
+        for index, (layer, out) in enumerate(zip(layers, workspace.outputs)):
+            activations[index + 1] = layer.forward(activations[index]) if out is None else layer.forward_into(activations[index], out[:samples])
+        
+        loss, grad = loss_function.forward_backward(y_batch, activations[-1])
+        
+        for index in range(len(layers) - 1, workspace.first_trainable - 1, -1):
+            layer, out = layers[index], workspace.input_gradients[index]
+            if out is not None:
+                out = out[:samples]
+            if layer._prime_from_output:
+                grad = layer.backward_from_output(activations[index + 1], grad, out)
+            else:
+                grad = layer.backward_into(activations[index], grad, learning_rate, optimizer, out)
+        return loss
  
     def dump(self, file_path: str) -> None:
-        with open(file_path.lstrip(".pkl") + ".pkl", "wb") as file:
-            file.write(self.dumps())
+        """
+        Save network with its architecture to file_path, see neural_network.network.model_file. .nnm is added unless
+        file_path already ends with it, and replaces .pkl.
+        """
+        save_model(file_path, self.layers, self.loss, self.dtype)
+    
+    def load(self, file_path: str, mode: str = "c") -> None:
+        """
+        Load parameters saved with dump into this network, they are memory mapped (copy on write with the default mode) instead of read.
+        Falls back to a .pkl file saved before the current format if there is no .nnm file.
+        """
+        if os.path.exists(model_path(file_path)):
+            load_parameters(file_path, self.layers, mode)
+            return
+        with open(str(file_path).removesuffix(LEGACY_SUFFIX) + LEGACY_SUFFIX, "rb") as file:
+            self.loads(file.read())
+    
+    @classmethod
+    def from_file(cls, file_path: str, preprocess: list = [], mode: str = "c") -> "Network":
+        """Make the network saved in file_path with dump, without declaring its layers. Preprocess functions are not saved so they have to be given"""
+        metadata, parameters = read_model(file_path, mode)
+        network = cls([make_layer(spec) for spec in metadata["layers"]], make_layer(metadata["loss"]), preprocess, dtype=metadata["dtype"])
+        for layer, arrays in zip(network.layers, parameters):
+            layer.set_parameters(arrays)
+        return network
     
     def dumps(self) -> bytes:
+        """Pickled parameters (without architecture), the format used before dump saved network files"""
         return pickle.dumps(
             tuple(layer.save_params() for layer in self.layers)
         )
     
-    def load(self, file_pah: str) -> None:
-        with open(file_pah + ".pkl", "rb") as file:
-            self.loads(file.read())
-    
     def loads(self, params: bytes) -> None:
         for layer, saved_layer_data in zip(self.layers, pickle.loads(params)):
-            layer.load_params(saved_layer_data)
\ No newline at end of file
+            layer.load_params(saved_layer_data)
@@ -0,0 +1,284 @@
+import multiprocessing
+import traceback
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from neural_network.optimizers.optimizers import Optimizer
+
+# start of each parameter in the shared vector is rounded up to this many bytes
+_ALIGNMENT = 64
+
+
+def _parameter_layout(layers, dtype: np.dtype) -> tuple[list[tuple[int, str, tuple, int]], int]:
+    """(layer index, name, shape, offset) for every parameter packed into one flat vector, and the size of that vector"""
+    step = max(_ALIGNMENT // dtype.itemsize, 1)
+    layout = []
+    offset = 0
+    for index, layer in enumerate(layers):
+        for name, param in layer.parameters().items():
+            layout.append((index, name, param.shape, offset))
+            offset = -(-(offset + param.size) // step) * step
+    return layout, offset
+
+
+def _views(flat: np.ndarray, layout) -> list[np.ndarray]:
+    return [flat[offset:offset + int(np.prod(shape))].reshape(shape) for _, _, shape, offset in layout]
+
+
+def _shared_array(shape: tuple, dtype, name: str = None) -> tuple[shared_memory.SharedMemory, np.ndarray]:
+    """Create (or attach to, if name is given) shared memory holding an array"""
+    dtype = np.dtype(dtype)
+    if name is None:
+        memory = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+    else:
+        memory = shared_memory.SharedMemory(name=name)
+    return memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+
+class _GradientCollector(Optimizer):
+    """Stands in for the optimizer in workers, gradients are copied (scaled by the workers share of the batch) to shared memory instead of applied"""
+
+    def __init__(self, targets: dict[tuple[int, str], np.ndarray]) -> None:
+        super().__init__()
+        self.targets = targets
+        self.scale = 1.0
+
+    def update(self, layer, name, gradient, learning_rate):
+        np.multiply(gradient, self.scale, out=self.targets[id(layer), name])
+
+    def update_rows(self, layer, name, rows, gradient, learning_rate):
+        target = self.targets[id(layer), name]
+        target.fill(0)
+        target[rows] = gradient * self.scale
+
+    def step(self, param, gradient, learning_rate, state):
+        pass
+
+
+def _worker(rank: int, workers: int, network, layout, size: int, parameters_name: str, gradients_name: str, hogwild: bool, connection, barrier) -> None:
+    memories = []
+    try:
+        memory, parameters = _shared_array((size,), network.dtype, parameters_name)
+        memories.append(memory)
+        memory, gradients = _shared_array((workers + 1, size), network.dtype, gradients_name)
+        memories.append(memory)
+
+        for (index, name, _, _), view in zip(layout, _views(parameters, layout)):
+            setattr(network.layers[index], name, view)
+
+        layers, loss_function = network._training_head()
+        collector = _GradientCollector({(id(network.layers[index]), name): view for (index, name, _, _), view in zip(layout, _views(gradients[rank], layout))})
+
+        # each worker sums its own part of everyones gradients, so the reduction is split across workers as well
+        bounds = np.linspace(0, size, workers + 1).astype(int)
+        reduce_start, reduce_stop = bounds[rank], bounds[rank + 1]
+
+        optimizer = None
+        x_batch = y_batch = None
+        batch_memories = []
+
+        while True:
+            message = connection.recv()
+            kind = message[0]
+
+            if kind == "stop":
+                break
+
+            if kind == "batch":
+                for memory in batch_memories:
+                    memory.close()
+                _, (x_name, x_shape, x_dtype), (y_name, y_shape, y_dtype) = message
+                x_memory, x_batch = _shared_array(x_shape, x_dtype, x_name)
+                y_memory, y_batch = _shared_array(y_shape, y_dtype, y_name)
+                batch_memories = [x_memory, y_memory]
+                continue
+
+            if kind == "optimizer":
+                # replaces the optimizer of the last call to train, it is not used again
+                _, optimizer = message
+                continue
+
+            _, start, stop, samples, learning_rate = message
+
+            if hogwild:
+                loss = 0.0
+                if stop > start:
+                    loss = network._train_batch(x_batch[start:stop], y_batch[start:stop], layers, loss_function, learning_rate, optimizer, network._workspace)
+                connection.send(("done", loss))
+                continue
+
+            if stop > start:
+                collector.scale = (stop - start) / samples
+                loss = network._train_batch(x_batch[start:stop], y_batch[start:stop], layers, loss_function, learning_rate, collector, network._workspace)
+            else:
+                loss = 0.0
+                gradients[rank].fill(0)
+
+            barrier.wait()
+            np.sum(gradients[:workers, reduce_start:reduce_stop], axis=0, out=gradients[workers, reduce_start:reduce_stop])
+            connection.send(("done", loss))
+    except BaseException:
+        barrier.abort()
+        connection.send(("error", traceback.format_exc()))
+    finally:
+        for memory in memories + batch_memories:
+            memory.close()
+
+
+class DataParallel:
+    """
+    Trains a network on several processes at once, each batch is split between workers.
+    Parameters and gradients are kept in shared memory. Normally workers compute gradients for their part of the batch,
+    these are summed (each worker reducing a slice of them) and the optimizer applies the average once, so training
+    matches a single process with the same batch size. With hogwild workers apply their own updates to the shared
+    parameters straight away without waiting for each other, each with its own copy of the optimizer.
+    Use as a context manager around calls to train or train_stream:
+        with DataParallel(network, workers=8):
+            network.train(x, y, batch_size=256)
+    Each worker only gets batch_size / workers samples, so bigger batches scale better. Workers are forked so the
+    network does not need to be pickled. Set OMP_NUM_THREADS=1 (or the BLAS equivalent) so workers do not fight over cores.
+    """
+
+    def __init__(self, network, workers: int = None, hogwild: bool = False) -> None:
+        self.network = network
+        self.workers = workers or multiprocessing.cpu_count()
+        self.hogwild = hogwild
+
+        if self.workers < 1:
+            raise ValueError(f"workers must be at least 1, got {self.workers}")
+
+        self._processes = None
+
+    def __enter__(self) -> "DataParallel":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def start(self) -> None:
+        """Move parameters to shared memory and start the workers"""
+        if self._processes is not None:
+            raise ValueError("DataParallel has already been started")
+
+        network = self.network
+        self._layout, size = _parameter_layout(network.layers, network.dtype)
+
+        self._parameters_memory, parameters = _shared_array((size,), network.dtype)
+        self._gradients_memory, gradients = _shared_array((self.workers + 1, size), network.dtype)
+        self._reduced = _views(gradients[self.workers], self._layout)
+
+        for (index, name, _, _), view in zip(self._layout, _views(parameters, self._layout)):
+            layer = network.layers[index]
+            view[...] = getattr(layer, name)
+            setattr(layer, name, view)
+
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        barrier = context.Barrier(self.workers)
+
+        self._connections = []
+        self._processes = []
+        for rank in range(self.workers):
+            connection, worker_connection = context.Pipe()
+            process = context.Process(target=_worker, daemon=True, args=(
+                rank, self.workers, network, self._layout, size, self._parameters_memory.name, self._gradients_memory.name,
+                self.hogwild, worker_connection, barrier))
+            process.start()
+            self._connections.append(connection)
+            self._processes.append(process)
+
+        self._batch_memories = []
+        self._x_batch = self._y_batch = None
+        self._sent_optimizer = None
+
+        network._parallel = self
+
+    def close(self) -> None:
+        """Stop the workers and move parameters back into normal memory"""
+        if self._processes is None:
+            return
+
+        for connection in self._connections:
+            try:
+                connection.send(("stop",))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join()
+        self._processes = None
+
+        for index, name, _, _ in self._layout:
+            layer = self.network.layers[index]
+            setattr(layer, name, getattr(layer, name).copy())
+        self.network._parallel = None
+        self._reduced = None
+        self._x_batch = self._y_batch = None
+        self._sent_optimizer = None
+
+        for memory in [self._parameters_memory, self._gradients_memory] + self._batch_memories:
+            memory.close()
+            memory.unlink()
+        self._batch_memories = []
+
+    def _share_batch(self, x_batch: np.ndarray, y_batch: np.ndarray) -> None:
+        """Copy a batch to shared memory, making a bigger block (and telling the workers) when it does not fit"""
+        fits = (self._x_batch is not None and len(x_batch) <= len(self._x_batch)
+                and x_batch.shape[1:] == self._x_batch.shape[1:] and x_batch.dtype == self._x_batch.dtype
+                and y_batch.shape[1:] == self._y_batch.shape[1:] and y_batch.dtype == self._y_batch.dtype)
+
+        if not fits:
+            x_memory, self._x_batch = _shared_array(x_batch.shape, x_batch.dtype)
+            y_memory, self._y_batch = _shared_array(y_batch.shape, y_batch.dtype)
+            message = ("batch", (x_memory.name, x_batch.shape, x_batch.dtype.str), (y_memory.name, y_batch.shape, y_batch.dtype.str))
+            for connection in self._connections:
+                connection.send(message)
+            # workers open the new block before the old one goes, the pipe keeps messages in order
+            for memory in self._batch_memories:
+                memory.close()
+                memory.unlink()
+            self._batch_memories = [x_memory, y_memory]
+
+        self._x_batch[:len(x_batch)] = x_batch
+        self._y_batch[:len(y_batch)] = y_batch
+
+    def _receive(self) -> list[float]:
+        losses, errors = [], []
+        for rank, connection in enumerate(self._connections):
+            kind, value = connection.recv()
+            if kind == "error":
+                errors.append(f"Worker {rank} failed:\n{value}")
+            else:
+                losses.append(value)
+        if errors:
+            raise RuntimeError("\n".join(errors))
+        return losses
+
+    def train_batch(self, x_batch: np.ndarray, y_batch: np.ndarray, learning_rate: float, optimizer: Optimizer) -> float:
+        """Train on one prepared batch split across the workers, returns its loss"""
+        if self._processes is None:
+            raise ValueError("DataParallel has not been started")
+
+        self._share_batch(x_batch, y_batch)
+
+        samples = len(x_batch)
+        bounds = np.linspace(0, samples, self.workers + 1).astype(int)
+
+        if self.hogwild and self._sent_optimizer is not optimizer:
+            # workers keep their own copy of only the newest optimizer, each call to train can make a new one
+            self._sent_optimizer = optimizer
+            for connection in self._connections:
+                connection.send(("optimizer", optimizer))
+
+        for rank, connection in enumerate(self._connections):
+            connection.send(("step", bounds[rank], bounds[rank + 1], samples, learning_rate))
+
+        losses = self._receive()
+        loss = sum(loss * (stop - start) for loss, start, stop in zip(losses, bounds[:-1], bounds[1:])) / samples
+
+        if not self.hogwild:
+            for (index, name, _, _), gradient in zip(self._layout, self._reduced):
+                optimizer.update(self.network.layers[index], name, gradient, learning_rate)
+
+        return loss
@@ -0,0 +1,166 @@
+import json
+import time
+import tracemalloc
+
+_FORWARD_METHODS = ("forward", "forward_into")
+_BACKWARD_METHODS = ("backward", "backward_into", "backward_from_output")
+
+
+class Profiler:
+    """
+    Records wall time, calls and (with memory) peak bytes allocated for each layers forward and backward, the loss,
+    getting batches (shuffling, gathering and preprocessing) and whole training steps, while it is active.
+    Whatever is left of a step after the layers and loss is Python overhead in the training loop.
+    Use as a context manager around calls to train, train_stream or predict:
+        with Profiler(network) as profiler:
+            network.train(x, y)
+        print(profiler.table())
+    Layer methods are only wrapped while active, so there is no cost when not profiling. Backward of a layer includes
+    its optimizer update. memory uses tracemalloc, which slows everything down a lot, so times are less accurate with it.
+    """
+
+    def __init__(self, network, memory: bool = False) -> None:
+        self.network = network
+        self.memory = memory
+
+        self.records: dict[str, list] = {}
+
+        self._wrapped = []
+        self._depth = 0
+        self._started_tracing = False
+        # time spent in layers and the loss during steps, the rest of a step is overhead
+        self._in_step = False
+        self._layer_seconds_in_steps = 0.0
+        self._last_seconds = 0.0
+
+    def __enter__(self) -> "Profiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        if self.network._profiler is not None:
+            raise ValueError("Network is already being profiled")
+
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+        for index, layer in enumerate(self.network.layers):
+            name = f"{index} {type(layer).__name__}"
+            self._wrap(layer, _FORWARD_METHODS, f"{name} forward")
+            self._wrap(layer, _BACKWARD_METHODS, f"{name} backward")
+        self.wrap_loss(self.network.loss)
+
+        self.network._profiler = self
+
+    def stop(self) -> None:
+        self.network._profiler = None
+
+        for target, method in self._wrapped:
+            del target.__dict__[method]
+        self._wrapped = []
+
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def reset(self) -> None:
+        """Forget everything recorded so far"""
+        self.records.clear()
+        self._layer_seconds_in_steps = 0.0
+
+    def wrap_loss(self, loss) -> None:
+        """Record the loss, training uses its own loss object when a final Softmax is fused into it"""
+        if "forward_backward" not in loss.__dict__:
+            self._wrap(loss, ("forward", "backward", "forward_backward"), f"loss {type(loss).__name__}")
+
+    def _wrap(self, target, methods: tuple[str, ...], name: str) -> None:
+        for method in methods:
+            if hasattr(target, method):
+                setattr(target, method, self._timed(name, getattr(target, method)))
+                self._wrapped.append((target, method))
+
+    def _timed(self, name: str, function):
+        def timed(*args, **kwargs):
+            # layer methods call each other (like backward calling backward_into), only the outer call is counted
+            if self._depth:
+                return function(*args, **kwargs)
+            self._depth += 1
+            try:
+                return self._record(name, self.memory, function, args, kwargs)
+            finally:
+                self._depth -= 1
+                if self._in_step:
+                    self._layer_seconds_in_steps += self._last_seconds
+        return timed
+
+    def time(self, name: str, function, *args, **kwargs):
+        """Call function and record it as name"""
+        return self._record(name, self.memory, function, args, kwargs)
+
+    def time_step(self, function, *args, **kwargs):
+        """Call function and record it as a training step, without memory as the layers inside it measure their own"""
+        self._in_step = True
+        try:
+            return self._record("step", False, function, args, kwargs)
+        finally:
+            self._in_step = False
+
+    def _record(self, name: str, memory: bool, function, args, kwargs):
+        if memory:
+            tracemalloc.reset_peak()
+            start_bytes = tracemalloc.get_traced_memory()[0]
+
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            seconds = self._last_seconds = time.perf_counter() - start
+            allocated = tracemalloc.get_traced_memory()[1] - start_bytes if memory else 0
+
+            record = self.records.get(name)
+            if record is None:
+                record = self.records[name] = [0, 0.0, 0]
+            record[0] += 1
+            record[1] += seconds
+            record[2] += allocated
+
+    def timed_batches(self, batches):
+        """Yield from batches recording how long each one takes to get"""
+        iterator = iter(batches)
+        while True:
+            try:
+                batch = self.time("batching", next, iterator)
+            except StopIteration:
+                return
+            yield batch
+
+    def report(self) -> dict:
+        """Recorded sections, slowest first, with the time of steps not spent in layers or the loss as overhead"""
+        sections = [{"name": name, "calls": calls, "seconds": seconds, "bytes": allocated}
+                    for name, (calls, seconds, allocated) in self.records.items()]
+        sections.sort(key=lambda section: section["seconds"], reverse=True)
+
+        step_seconds = self.records.get("step", [0, 0.0, 0])[1]
+        return {"sections": sections, "step_seconds": step_seconds, "overhead_seconds": max(step_seconds - self._layer_seconds_in_steps, 0.0)}
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.report(), **kwargs)
+
+    def table(self) -> str:
+        report = self.report()
+        step_seconds = report["step_seconds"]
+        rows = report["sections"] + [{"name": "overhead (rest of step)", "calls": self.records.get("step", [0])[0], "seconds": report["overhead_seconds"], "bytes": 0}]
+
+        lines = [f"{'section':<36} {'calls':>8} {'total s':>10} {'mean ms':>10} {'% step':>7} {'bytes':>14}"]
+        for row in rows:
+            mean = row["seconds"] / row["calls"] * 1000 if row["calls"] else 0.0
+            percent = f"{row['seconds'] / step_seconds:.1%}" if step_seconds and row["name"] not in ("step", "batching") else ""
+            lines.append(f"{row['name']:<36} {row['calls']:>8} {row['seconds']:>10.4f} {mean:>10.4f} {percent:>7} {row['bytes'] if self.memory else '':>14}")
+        return "\n".join(lines)
+
+    def __str__(self) -> str:
+        return self.table()
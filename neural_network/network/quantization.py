@@ -0,0 +1,56 @@
+import time
+
+import numpy as np
+
+from neural_network.layers import Dense, QuantizedDense
+from neural_network.network.network import Network
+
+
+def quantize(network: Network, block_size: int = 256) -> Network:
+    """
+    Inference only copy of network where every Dense is a QuantizedDense, other layers and preprocess are shared with it.
+    This is for smaller weights, not speed, a float32 network is faster. Use quantization_report to check how much it
+    changes the outputs before using it instead of network.
+    """
+    # SparseDense only adds up a few rows already, so it is left as it is
+    layers = [QuantizedDense.from_dense(layer, block_size) if type(layer) is Dense else layer for layer in network.layers]
+    return Network(layers, network.loss, network.reprocesses, network.dtype)
+
+
+def _weight_bytes(network: Network) -> int:
+    return sum(param.nbytes for layer in network.layers for param in layer.parameters().values())
+
+
+def _timed_predict(network: Network, x: np.ndarray, batch_size: int) -> tuple[np.ndarray, float]:
+    start = time.perf_counter()
+    outputs = network.predict(x, batch_size)
+    return outputs, time.perf_counter() - start
+
+
+def quantization_report(network: Network, quantized: Network, x: np.ndarray, y: np.ndarray = None, batch_size: int = 1024) -> dict:
+    """
+    Compare quantized to the network it was made from on inputs x: parameter bytes, predict time, how far the outputs
+    are apart and how often both pick the same output. With labels y (class indexes or one hot) accuracy of both is added.
+    """
+    outputs, seconds = _timed_predict(network, x, batch_size)
+    quantized_outputs, quantized_seconds = _timed_predict(quantized, x, batch_size)
+
+    error = np.abs(quantized_outputs.astype(np.float64) - outputs)
+    report = {
+        "parameter_bytes": _weight_bytes(network),
+        "quantized_parameter_bytes": _weight_bytes(quantized),
+        "seconds": seconds,
+        "quantized_seconds": quantized_seconds,
+        "max_error": float(np.max(error)),
+        "mean_error": float(np.mean(error)),
+    }
+
+    if outputs.shape[-1] > 1:
+        predicted, quantized_predicted = np.argmax(outputs, axis=-1), np.argmax(quantized_outputs, axis=-1)
+        report["agreement"] = float(np.mean(predicted == quantized_predicted))
+        if y is not None:
+            labels = np.argmax(y, axis=-1) if y.ndim == outputs.ndim else y
+            report["accuracy"] = float(np.mean(predicted == labels))
+            report["quantized_accuracy"] = float(np.mean(quantized_predicted == labels))
+
+    return report
@@ -0,0 +1,134 @@
+import json
+
+import numpy as np
+
+_UNITS = ("", "K", "M", "G", "T")
+
+
+def _human(value: float, suffix: str = "", base: int = 1000) -> str:
+    for unit in _UNITS:
+        if abs(value) < base or unit == _UNITS[-1]:
+            return f"{value:.3g}{unit}{suffix}" if unit else f"{value:.0f}{suffix}"
+        value /= base
+
+
+class NetworkSummary:
+    """
+    What a network costs for batches of batch_size samples of input_shape: parameters (count and bytes per dtype), rough
+    forward and backward FLOPs, and the memory for activations and gradients when training (as after compile) and for
+    predict. Made with Network.summary, report gives a dict and table (or printing it) a table.
+    FLOPs count a multiply and add as two and functions like exp as one, the optimizer update is not counted.
+    Parameter gradients are what each layer keeps in backward, only the picked rows for SparseDense.
+    """
+
+    def __init__(self, network, input_shape: tuple, batch_size: int = 32, input_dtype=None) -> None:
+        # imported here as network imports this module
+        from neural_network.network.network import _workspace_plan
+
+        self.input_shape = tuple(input_shape)
+        self.batch_size = batch_size
+        self.dtype = network.dtype
+        if input_dtype is None:
+            input_dtype = np.intp if network.layers and network.layers[0]._index_inputs else network.dtype
+        self.input_dtype = np.dtype(input_dtype)
+
+        shapes = [self.input_shape]
+        for layer in network.layers:
+            shapes.append(layer.output_shape(shapes[-1]))
+
+        training_layers, training_loss = network._training_head()
+        training_shapes, owners, first_trainable = _workspace_plan(training_layers, self.input_shape)
+
+        self.layers = []
+        gradient_sizes = []
+        parameter_bytes = {}
+        for index, (layer, shape) in enumerate(zip(network.layers, shapes)):
+            parameters = layer.parameters()
+            for param in parameters.values():
+                parameter_bytes[param.dtype.name] = parameter_bytes.get(param.dtype.name, 0) + param.nbytes
+
+            forward, backward = layer.flops(shape, input_gradient=index > first_trainable)
+            gradient_sizes.append(layer.gradient_size(shape, batch_size))
+            if index >= len(training_layers):
+                # fused into the loss when training
+                backward, note = 0, "fused into loss"
+            elif index < first_trainable:
+                backward, note = 0, "no backward needed"
+            else:
+                note = ""
+
+            self.layers.append({
+                "index": index,
+                "name": type(layer).__name__,
+                "output_shape": list(shapes[index + 1]),
+                "parameters": sum(param.size for param in parameters.values()),
+                "forward_flops": forward * batch_size,
+                "backward_flops": backward * batch_size,
+                "note": note,
+            })
+
+        loss_forward, loss_backward = training_loss.flops(training_shapes[-1])
+        self.loss = {"name": type(training_loss).__name__, "flops": (loss_forward + loss_backward) * batch_size}
+
+        self.parameters = sum(row["parameters"] for row in self.layers)
+        self.parameter_bytes = parameter_bytes
+
+        training_forward = sum(row["forward_flops"] for row in self.layers[:len(training_layers)])
+        self.inference_flops = sum(row["forward_flops"] for row in self.layers)
+        self.training_flops = training_forward + sum(row["backward_flops"] for row in self.layers) + self.loss["flops"]
+
+        itemsize = self.dtype.itemsize
+
+        def batch_bytes(shape, itemsize=itemsize) -> int:
+            return batch_size * int(np.prod(shape)) * itemsize
+
+        input_bytes = batch_bytes(self.input_shape, self.input_dtype.itemsize)
+        activations = input_bytes + sum(batch_bytes(training_shapes[owner + 1]) for owner in set(owners) if owner is not None)
+        gradients = batch_bytes(training_shapes[-1]) + sum(batch_bytes(shape) for index, shape in enumerate(training_shapes[:-1]) if index > first_trainable)
+        parameter_gradients = sum(gradient_sizes[first_trainable:len(training_layers)]) * itemsize
+        self.training_memory = {"activations": activations, "gradients": gradients, "parameter_gradients": parameter_gradients,
+                                "total": activations + gradients + parameter_gradients}
+
+        # predict keeps the input chunk and ping pongs between two buffers big enough for any layers output
+        self.inference_memory = input_bytes + 2 * max(batch_bytes(shape) for shape in shapes[1:])
+
+    def report(self) -> dict:
+        return {
+            "input_shape": list(self.input_shape),
+            "batch_size": self.batch_size,
+            "dtype": self.dtype.name,
+            "input_dtype": self.input_dtype.name,
+            "layers": self.layers,
+            "loss": self.loss,
+            "parameters": self.parameters,
+            "parameter_bytes": self.parameter_bytes,
+            "inference_flops": self.inference_flops,
+            "training_flops": self.training_flops,
+            "training_memory": self.training_memory,
+            "inference_memory": self.inference_memory,
+        }
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.report(), **kwargs)
+
+    def table(self) -> str:
+        dtypes = self.dtype.name if self.input_dtype == self.dtype else f"{self.dtype.name}, {self.input_dtype.name} inputs"
+        lines = [f"Network summary for batches of {self.batch_size} x {self.input_shape} ({dtypes})",
+                 f"{'layer':<28} {'output shape':<16} {'parameters':>12} {'forward FLOPs':>14} {'backward FLOPs':>15}"]
+        for row in self.layers:
+            name = f"{row['index']} {row['name']}"
+            backward = _human(row["backward_flops"]) if not row["note"] else row["note"]
+            lines.append(f"{name:<28} {str(tuple(row['output_shape'])):<16} {row['parameters']:>12,} {_human(row['forward_flops']):>14} {backward:>15}")
+        lines.append(f"{'loss ' + self.loss['name']:<58} {_human(self.loss['flops']):>14}")
+        lines.append("")
+        parameter_bytes = ", ".join(f"{_human(size, 'B', 1024)} {dtype}" for dtype, size in self.parameter_bytes.items())
+        lines.append(f"Parameters: {self.parameters:,} ({parameter_bytes or 'no bytes'})")
+        lines.append(f"FLOPs per batch: {_human(self.inference_flops)} inference, {_human(self.training_flops)} training")
+        memory = self.training_memory
+        lines.append(f"Training memory: {_human(memory['total'], 'B', 1024)} ({_human(memory['activations'], 'B', 1024)} activations, "
+                     f"{_human(memory['gradients'], 'B', 1024)} gradients, {_human(memory['parameter_gradients'], 'B', 1024)} parameter gradients)")
+        lines.append(f"Inference memory: {_human(self.inference_memory, 'B', 1024)}")
+        return "\n".join(lines)
+
+    def __str__(self) -> str:
+        return self.table()
@@ -0,0 +1,3 @@
+from .optimizers import SGD, RMSProp, Adam, AdamW
+
+__all__ = [SGD, RMSProp, Adam, AdamW]
@@ -0,0 +1,224 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+# state key of work space reused between steps, made again whenever it is missing
+_SCRATCH = "scratch"
+
+
+class Optimizer(ABC):
+    """
+    Layers hand their gradients to an optimizer, which decides how the parameters are changed.
+    Any running state (like momentum) is kept per parameter, so reuse the same optimizer between calls to train to keep it.
+    Parameters are updated in place, and the gradient array is used as scratch space so it should not be read after an update.
+    """
+    _verbose_name = ""
+
+    def __init__(self) -> None:
+        self._states: dict[tuple[int, str], dict] = {}
+
+    def __str__(self) -> str:
+        return f"<Optimizer {self._verbose_name if self._verbose_name else type(self).__name__}>".title()
+
+    def __repr__(self) -> str:
+        dict_str = ", ".join(f"{key}={value}" for key, value in self.__dict__.items() if not key.startswith("_"))
+        return f"{type(self).__name__}({dict_str})"
+
+    def update(self, layer, name: str, gradient: np.ndarray, learning_rate: float) -> None:
+        """Apply gradient in place to the parameter stored on layer as attribute name"""
+        param = getattr(layer, name)
+
+        key = (id(layer), name)
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = self.init_state(param)
+
+        self.step(param, gradient, learning_rate, state)
+
+    def update_rows(self, layer, name: str, rows: np.ndarray, gradient: np.ndarray, learning_rate: float) -> None:
+        """
+        Apply gradient for only rows (without repeats) of the parameter, gradient has one row for each of them.
+        State of the other rows is left alone, so rows that got no gradient do not move at all (not even from momentum).
+        """
+        param = getattr(layer, name)
+
+        key = (id(layer), name)
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = self.init_state(param)
+
+        row_param = param[rows]
+        row_state = {state_name: value[rows] if isinstance(value, np.ndarray) else value for state_name, value in state.items() if state_name != _SCRATCH}
+        self.step(row_param, gradient, learning_rate, row_state)
+
+        param[rows] = row_param
+        for state_name, value in row_state.items():
+            if state_name == _SCRATCH:
+                continue
+            if isinstance(value, np.ndarray):
+                state[state_name][rows] = value
+            else:
+                state[state_name] = value
+
+    def reset(self) -> None:
+        """Forget all running state"""
+        self._states.clear()
+
+    def get_state(self, layers: list) -> dict[str, np.ndarray]:
+        """Copy of running state for layers as named arrays ("layer index.parameter name.key"), numbers become 0 dimensional arrays"""
+        indices = {id(layer): index for index, layer in enumerate(layers)}
+        arrays = {}
+        for (layer_id, name), state in self._states.items():
+            if layer_id in indices:
+                for key, value in state.items():
+                    if key != _SCRATCH:
+                        arrays[f"{indices[layer_id]}.{name}.{key}"] = np.array(value)
+        return arrays
+
+    def set_state(self, layers: list, arrays: dict[str, np.ndarray]) -> None:
+        """Replace running state with state from get_state, layers must be in the same order as when it was saved"""
+        self._states.clear()
+        for full_name, value in arrays.items():
+            index, name, key = full_name.split(".")
+            state = self._states.setdefault((id(layers[int(index)]), name), {})
+            state[key] = value.item() if value.ndim == 0 else np.array(value)
+
+    def init_state(self, param: np.ndarray) -> dict:
+        return {}
+
+    @staticmethod
+    def _scratch(param: np.ndarray, state: dict) -> np.ndarray:
+        """Work space shaped like param kept in state between steps, it is not running state so get_state leaves it out"""
+        scratch = state.get(_SCRATCH)
+        if scratch is None or scratch.shape != param.shape or scratch.dtype != param.dtype:
+            scratch = state[_SCRATCH] = np.empty_like(param)
+        return scratch
+
+    @abstractmethod
+    def step(self, param: np.ndarray, gradient: np.ndarray, learning_rate: float, state: dict) -> None:
+        pass
+
+
+class SGD(Optimizer):
+    """
+    Stochastic Gradient Descent.
+    Moves parameters against their gradient. With momentum a running velocity is kept so steps build up speed in consistent directions.
+    Pros: Simple and cheap, with momentum it goes through flat areas and small bumps a lot faster.
+    Cons: Without momentum it needs many epochs, learning rate has to be tuned by hand.
+    """
+    _verbose_name = "stochastic gradient descent"
+
+    def __init__(self, momentum: float = 0.0, nesterov: bool = False) -> None:
+        super().__init__()
+        self.momentum = momentum
+        self.nesterov = nesterov
+
+    def init_state(self, param):
+        if not self.momentum:
+            return {}
+        return {"velocity": np.zeros_like(param)}
+
+    def step(self, param, gradient, learning_rate, state):
+        gradient *= learning_rate
+
+        if not self.momentum:
+            param -= gradient
+            return
+
+        velocity = state["velocity"]
+        velocity *= self.momentum
+        velocity -= gradient
+
+        if self.nesterov:
+            param -= gradient
+            np.multiply(velocity, self.momentum, out=gradient)
+            param += gradient
+        else:
+            param += velocity
+
+
+class RMSProp(Optimizer):
+    """
+    Root Mean Square Propagation.
+    Divides each step by a running average of recent gradient sizes, so every parameter gets its own learning rate.
+    Pros: Handles parameters with very different gradient sizes well.
+    """
+    _verbose_name = "root mean square propagation"
+
+    def __init__(self, rho: float = 0.9, epsilon: float = 1e-7) -> None:
+        super().__init__()
+        self.rho = rho
+        self.epsilon = epsilon
+
+    def init_state(self, param):
+        return {"square_average": np.zeros_like(param)}
+
+    def step(self, param, gradient, learning_rate, state):
+        square_average, scratch = state["square_average"], self._scratch(param, state)
+
+        square_average *= self.rho
+        np.square(gradient, out=scratch)
+        scratch *= 1 - self.rho
+        square_average += scratch
+
+        np.sqrt(square_average, out=scratch)
+        scratch += self.epsilon
+        gradient /= scratch
+        gradient *= learning_rate
+        param -= gradient
+
+
+class Adam(Optimizer):
+    """
+    Adaptive Moment Estimation.
+    Momentum and RMSProp together, with a correction so the first steps are not too small.
+    Pros: Works well on most problems without much tuning, normally needs far fewer epochs than SGD.
+    """
+    _verbose_name = "adaptive moment estimation"
+
+    def __init__(self, beta_1: float = 0.9, beta_2: float = 0.999, epsilon: float = 1e-7) -> None:
+        super().__init__()
+        self.beta_1 = beta_1
+        self.beta_2 = beta_2
+        self.epsilon = epsilon
+
+    def init_state(self, param):
+        return {"iterations": 0, "momentum": np.zeros_like(param), "square_average": np.zeros_like(param)}
+
+    def step(self, param, gradient, learning_rate, state):
+        state["iterations"] += 1
+        iterations = state["iterations"]
+        momentum, square_average, scratch = state["momentum"], state["square_average"], self._scratch(param, state)
+
+        momentum *= self.beta_1
+        np.multiply(gradient, 1 - self.beta_1, out=scratch)
+        momentum += scratch
+
+        square_average *= self.beta_2
+        np.square(gradient, out=scratch)
+        scratch *= 1 - self.beta_2
+        square_average += scratch
+
+        # bias correction: momentum / (1 - beta_1^t) / (sqrt(square_average / (1 - beta_2^t)) + epsilon)
+        np.sqrt(square_average, out=scratch)
+        scratch /= np.sqrt(1 - self.beta_2 ** iterations)
+        scratch += self.epsilon
+        np.divide(momentum, scratch, out=scratch)
+        scratch *= learning_rate / (1 - self.beta_1 ** iterations)
+        param -= scratch
+
+
+class AdamW(Adam):
+    """
+    Adam with decoupled Weight decay.
+    Shrinks parameters towards zero separately from the gradient step, which regularizes better than adding it to the loss.
+    """
+    _verbose_name = "adam with decoupled weight decay"
+
+    def __init__(self, beta_1: float = 0.9, beta_2: float = 0.999, epsilon: float = 1e-7, weight_decay: float = 0.004) -> None:
+        super().__init__(beta_1, beta_2, epsilon)
+        self.weight_decay = weight_decay
+
+    def step(self, param, gradient, learning_rate, state):
+        param *= 1 - learning_rate * self.weight_decay
+        super().step(param, gradient, learning_rate, state)
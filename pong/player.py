@@ -216,13 +216,19 @@ class AIPaddle(Paddle):
         self.model = model
         self.model_file = self.MODEL_SAVE_FILES.get(model)
 
-        if self.model_file is not None:
-            self.model.load(self.model_file)
-        else:
+        if self.model_file is None:
             print("Warning: Model not recognized, not loading any saved weights.")
 
+        # weights are loaded when the paddle first plays, so making paddles (like for the menu) stays fast
+        self.weights_loaded = self.model_file is None
+
         self.layer_activations = []
     
+    def load_weights(self) -> None:
+        if not self.weights_loaded:
+            self.model.load(self.model_file)
+            self.weights_loaded = True
+    
     @staticmethod
     def inputs_to_array(paddle: "Paddle", ball: Ball) -> np.ndarray:
         return np.array([   
@@ -232,6 +238,7 @@ class AIPaddle(Paddle):
         ])
             
     def find_next_move(self, ball: Ball) -> None:
+        self.load_weights()
         self.layer_activations = [self.inputs_to_array(self, ball).reshape(1, -1)]
 
         for layer in self.model.layers:
@@ -250,6 +257,7 @@ class AIPaddle(Paddle):
         return f"{neurons} Neuron AI"
     
     def draw_network(self, screen: pygame.Surface, flipped: bool) -> None:
+        self.load_weights()
         dense_layers_actations: list[np.ndarray] = []
         dense_layers: list[nn.layers.Dense] = []
         for layer_activations, layer in zip(self.layer_activations, [None] + self.model.layers, strict=True):
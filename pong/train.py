@@ -4,9 +4,17 @@ from player import AIPaddle, BallPredictionPaddle
 
 import numpy as np
 
+import neural_network as nn
+
 MODEL = AIPaddle.DEFAULT_NETWORK
 MODEL_FILE = AIPaddle.MODEL_SAVE_FILES[MODEL]
 
+OPTIMIZER = nn.optimizers.SGD()
+
+# each round is saved here so a stopped run continues where it was
+CHECKPOINT_FOLDER = AIPaddle.NETWORK_FOLDER.parent / "checkpoints"
+CHECKPOINTS_KEPT = 3
+
 def function(*args):
     return BallPredictionPaddle.determine_direction(*args, handle_bounces=True)
 
@@ -19,6 +27,8 @@ ROUNDS = 10000
 
 TRAIN_N = 1_000_000
 TEST_N = 1000
+# same test data every run, so results can be compared after resuming
+TEST_SEED = 0
 
 BATCH_SIZE = 2**6
 EPOCHS = 20
@@ -71,12 +81,19 @@ def main() -> None:
     print(f"{BATCH_SIZE=}, {EPOCHS=}")
     print()
 
-    if LOAD_PAST_MODEL:
+    np.random.seed(TEST_SEED)
+    X_test, y_test = create_data(TEST_N)
+    np.random.seed()
+
+    checkpoints = nn.network.CheckpointManager(CHECKPOINT_FOLDER, MODEL, OPTIMIZER, keep=CHECKPOINTS_KEPT)
+    resumed = checkpoints.restore()
+
+    if resumed is not None:
+        print(f"Resuming after round {resumed['step'] + 1} from {checkpoints.latest()}")
+    elif LOAD_PAST_MODEL:
         MODEL.load(MODEL_FILE)
         print(f"Loaded past model from {MODEL_FILE}")
 
-    X_test, y_test = create_data(TEST_N)
-
     if VISUIZE_DATA:
         plotted = 100
         from matplotlib import pyplot
@@ -94,13 +111,18 @@ def main() -> None:
         pyplot.show()
 
     print()
-    predictions = MODEL.compute(X_test)
-    initial_loss = MODEL.loss.forward(y_test, predictions)
-    initial_accuracy = np.sum(accuracy_function(y_test, predictions))
+    if resumed is not None:
+        first_round = resumed["step"] + 1
+        initial_loss, initial_accuracy = resumed["extra"]["initial_loss"], resumed["extra"]["initial_accuracy"]
+    else:
+        first_round = 0
+        predictions = MODEL.predict(X_test)
+        initial_loss = float(MODEL.loss.forward(y_test, predictions))
+        initial_accuracy = int(np.sum(accuracy_function(y_test, predictions)))
     print(f"Test loss: {initial_loss}")
     print(f"Sign accuracy score: {initial_accuracy} / {TEST_N} ({initial_accuracy / TEST_N:.2%})")
 
-    for i in range(ROUNDS):
+    for i in range(first_round, ROUNDS):
         print()
 
         learning_rate = leanring_rate_schedule(i)
@@ -115,7 +137,7 @@ def main() -> None:
 
         print(f"Training on {X_train.shape} samples ({np.sum(y_train > 0)} positive, {np.sum(y_train < 0)} negative)")
 
-        MODEL.train(X_train, y_train, batch_size=BATCH_SIZE, epochs=EPOCHS, learning_rate=learning_rate, logging=False)
+        MODEL.train(X_train, y_train, batch_size=BATCH_SIZE, epochs=EPOCHS, learning_rate=learning_rate, logging=False, optimizer=OPTIMIZER)
 
         print()
 
@@ -123,7 +145,7 @@ def main() -> None:
 
         print("Evaluating model...")
 
-        predictions = MODEL.compute(X_test)
+        predictions = MODEL.predict(X_test)
 
         loss = MODEL.loss.forward(y_test, predictions)
         accuracy = np.sum(accuracy_function(y_test, predictions))
@@ -131,17 +153,24 @@ def main() -> None:
         accuracy_change = accuracy - initial_accuracy
 
         print("Sample predictions:")
-        for i in range(5):
-            print(f"  Input: {X_test[i]}")
-            print(f"  Prediction: {predictions[i][0]}, Actual: {y_test[i][0]}, Sign match: {(np.sign(predictions[i]) == np.sign(y_test[i]))[0]}, Loss: {MODEL.loss.forward(y_test[i], predictions[i])}")
+        for sample in range(5):
+            print(f"  Input: {X_test[sample]}")
+            print(f"  Prediction: {predictions[sample][0]}, Actual: {y_test[sample][0]}, Sign match: {(np.sign(predictions[sample]) == np.sign(y_test[sample]))[0]}, Loss: {MODEL.loss.forward(y_test[sample], predictions[sample])}")
 
         print(f"Test loss: {loss}")
         print(f"Sign accuracy score: {accuracy} / {TEST_N} ({accuracy / TEST_N:.2%})")
         print(f"Sign accuracy score change from initial: {accuracy_change:+}")
 
+        # written in the background while the next round trains
+        checkpoints.save(i, {"initial_loss": initial_loss, "initial_accuracy": initial_accuracy})
+        print(f"Checkpoint saved to {CHECKPOINT_FOLDER}")
+
+        # the game loads the model file, so keep it as current as the checkpoints
         MODEL.dump(MODEL_FILE)
         print(f"Model saved to {MODEL_FILE}")
 
+    checkpoints.wait()
+
     print()
     print("Training complete. (100.00%)")
 
@@ -0,0 +1,4 @@
+import pathlib, sys
+
+# the repo is not installed as a package, same as the projects the tests import it from the folder above
+sys.path.append(str(pathlib.Path(__file__).parent.parent.absolute()))
@@ -0,0 +1,52 @@
+"""
+One rank of the distributed training test, started by test_distributed.py through the launcher.
+
+    distributed_worker.py OUTPUT_FOLDER [--compress]
+
+Trains make_network on its shard of make_data and saves its parameters to OUTPUT_FOLDER/rank{RANK}.npz.
+"""
+
+import os
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent.absolute()))
+
+import numpy as np
+
+import neural_network as nn
+
+BATCH_SIZE = 4
+STEPS = 5
+
+
+def make_network(seed: int) -> nn.network.Network:
+    np.random.seed(seed)
+    return nn.network.Network([nn.layers.Dense(5, 8), nn.activations.Tanh(), nn.layers.Dense(8, 2)], loss=nn.losses.MSE())
+
+
+def make_data(samples: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(0)
+    return rng.standard_normal((samples, 5)), rng.standard_normal((samples, 2))
+
+
+def parameters(network) -> dict[str, np.ndarray]:
+    return {f"{index}.{name}": param for index, layer in enumerate(network.layers) for name, param in layer.parameters().items()}
+
+
+def main() -> None:
+    output_folder, compress = sys.argv[1], "--compress" in sys.argv[2:]
+    group = nn.distributed.ProcessGroup.from_environment(timeout=60)
+
+    # every rank starts different, training has to start from rank 0's parameters
+    network = make_network(seed=group.rank)
+    x, y = make_data(group.world_size * BATCH_SIZE * STEPS)
+
+    with nn.distributed.DistributedDataParallel(network, group, compress=compress):
+        network.train(group.shard(x), group.shard(y), learning_rate=0.1, batch_size=BATCH_SIZE, shuffle=False, logging=False)
+
+    np.savez(os.path.join(output_folder, f"rank{group.rank}.npz"), **parameters(network))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import copy
+
+import numpy as np
+import pytest
+
+import neural_network as nn
+
+activations, layers, losses = nn.activations, nn.layers, nn.losses
+
+# pairs of activations that both back propagate from their outputs, stacked right after each other
+STACKED_ACTIVATIONS = [
+    (activations.Tanh, activations.Sigmoid),
+    (activations.ReLU, activations.Tanh),
+    (activations.Softplus, activations.Tanh),
+    (activations.Sigmoid, activations.Softmax),
+    (activations.Tanh, activations.Sigmoid, activations.Softplus),
+]
+
+
+def make_network(activation_classes) -> nn.network.Network:
+    np.random.seed(0)
+    return nn.network.Network([
+        layers.Dense(6, 8), *(activation() for activation in activation_classes), layers.Dense(8, 3),
+    ], loss=losses.MSE())
+
+
+def plain_step(network, x, y, learning_rate, optimizer) -> None:
+    """One training step that keeps every input and only uses backward, the way layers were trained before caching outputs"""
+    inputs = [x]
+    for layer in network.layers:
+        inputs.append(layer.forward(inputs[-1]))
+    grad = network.loss.backward(y, inputs[-1])
+    for layer, layer_inputs in zip(reversed(network.layers), reversed(inputs[:-1])):
+        grad = layer.backward(layer_inputs, grad, learning_rate, optimizer).copy()
+
+
+def parameters(network) -> list[np.ndarray]:
+    return [param for layer in network.layers for param in layer.parameters().values()]
+
+
+@pytest.mark.parametrize("compiled", [False, True])
+@pytest.mark.parametrize("activation_classes", STACKED_ACTIVATIONS, ids=lambda classes: "-".join(c.__name__ for c in classes))
+def test_stacked_activations_match_plain_backward(activation_classes, compiled):
+    rng = np.random.default_rng(1)
+    x, y = rng.standard_normal((40, 6)), rng.standard_normal((40, 3))
+
+    network = make_network(activation_classes)
+    expected = copy.deepcopy(network)
+    if compiled:
+        network.compile((6,), batch_size=10)
+
+    network.train(x, y, learning_rate=0.5, batch_size=10, shuffle=False, logging=False)
+    optimizer = nn.optimizers.SGD()
+    for start in range(0, len(x), 10):
+        plain_step(expected, x[start:start + 10], y[start:start + 10], 0.5, optimizer)
+
+    for param, expected_param in zip(parameters(network), parameters(expected)):
+        np.testing.assert_allclose(param, expected_param, rtol=1e-10, atol=1e-12)
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    return activations.Softmax().forward(logits)
+
+
+def test_fused_softmax_cross_entropy_matches_softmax_then_cross_entropy():
+    rng = np.random.default_rng(2)
+    logits = rng.standard_normal((16, 5))
+    labels = rng.integers(0, 5, 16)
+    one_hot = np.eye(5)[labels]
+
+    probabilities = softmax(logits)
+    expected_loss = losses.CategoricalCrossEntropy().forward(one_hot, probabilities)
+    expected_gradient = activations.Softmax().backward(logits, losses.CategoricalCrossEntropy().backward(one_hot, probabilities))
+
+    for fused, y_true in ((losses.SoftmaxCategoricalCrossEntropy(), one_hot), (losses.SoftmaxCategoricalCrossEntropy(categorical_labels=True), labels)):
+        loss, gradient = fused.forward_backward(y_true, logits)
+        assert loss == pytest.approx(expected_loss)
+        np.testing.assert_allclose(gradient, expected_gradient, atol=1e-12)
+
+
+@pytest.mark.parametrize("sparse_class, dense_class", [
+    (losses.SparseCategoricalCrossEntropy, losses.CategoricalCrossEntropy),
+    (losses.SparseBinaryCrossEntropy, losses.BinaryCrossEntropy),
+])
+def test_sparse_losses_match_dense_losses(sparse_class, dense_class):
+    rng = np.random.default_rng(3)
+    probabilities = softmax(rng.standard_normal((16, 5)))
+    labels = rng.integers(0, 5, 16)
+    one_hot = np.eye(5)[labels]
+
+    sparse, dense = sparse_class(), dense_class(categorical_labels=False)
+    assert sparse.forward(labels, probabilities) == pytest.approx(dense.forward(one_hot, probabilities))
+    np.testing.assert_allclose(sparse.backward(labels, probabilities), dense.backward(one_hot, probabilities), atol=1e-12)
+
+
+def test_training_with_fused_head_matches_plain_softmax_backward():
+    rng = np.random.default_rng(4)
+    x, labels = rng.standard_normal((32, 6)), rng.integers(0, 3, 32)
+
+    np.random.seed(0)
+    network = nn.network.Network([layers.Dense(6, 8), activations.Tanh(), layers.Dense(8, 3), activations.Softmax()],
+                                 loss=losses.SparseCategoricalCrossEntropy())
+    expected = copy.deepcopy(network)
+    expected.loss = losses.CategoricalCrossEntropy(categorical_labels=False)
+
+    network.train(x, labels, learning_rate=0.5, batch_size=8, shuffle=False, logging=False)
+    optimizer = nn.optimizers.SGD()
+    for start in range(0, len(x), 8):
+        plain_step(expected, x[start:start + 8], np.eye(3)[labels[start:start + 8]], 0.5, optimizer)
+
+    for param, expected_param in zip(parameters(network), parameters(expected)):
+        np.testing.assert_allclose(param, expected_param, rtol=1e-7, atol=1e-10)
@@ -0,0 +1,49 @@
+import numpy as np
+
+import neural_network as nn
+
+
+def test_restore_continues_numpy_and_own_generators(tmp_path):
+    network = nn.network.Network([nn.layers.Dense(3, 2)], loss=nn.losses.MSE())
+    generator = np.random.default_rng(5)
+
+    with nn.network.CheckpointManager(tmp_path, network, generators={"batches": generator}) as checkpoints:
+        generator.random(3)
+        checkpoints.save(7, {"note": "x"})
+    weights = network.layers[0].weights.copy()
+    expected_global, expected_own = np.random.random(4), generator.random(4)
+
+    network.layers[0].weights[:] = 0
+    generator.random(100)
+    np.random.random(100)
+
+    resumed = nn.network.CheckpointManager(tmp_path, network, generators={"batches": generator}).restore()
+    assert resumed == {"step": 7, "extra": {"note": "x"}}
+    np.testing.assert_array_equal(network.layers[0].weights, weights)
+    np.testing.assert_array_equal(np.random.random(4), expected_global)
+    np.testing.assert_array_equal(generator.random(4), expected_own)
+
+
+def test_adam_resumes_the_same_without_saving_scratch(tmp_path):
+    rng = np.random.default_rng(0)
+    x, y = rng.standard_normal((40, 3)), rng.standard_normal((40, 2))
+
+    def make_network():
+        np.random.seed(0)
+        return nn.network.Network([nn.layers.Dense(3, 4), nn.activations.Tanh(), nn.layers.Dense(4, 2)], loss=nn.losses.MSE())
+
+    network, optimizer = make_network(), nn.optimizers.Adam()
+    network.train(x, y, learning_rate=0.01, batch_size=10, shuffle=False, logging=False, optimizer=optimizer)
+    assert optimizer.get_state(network.layers) and not any(name.endswith(".scratch") for name in optimizer.get_state(network.layers))
+
+    with nn.network.CheckpointManager(tmp_path, network, optimizer) as checkpoints:
+        checkpoints.save(4)
+
+    resumed, resumed_optimizer = make_network(), nn.optimizers.Adam()
+    nn.network.CheckpointManager(tmp_path, resumed, resumed_optimizer).restore()
+
+    for trained, trained_optimizer in ((network, optimizer), (resumed, resumed_optimizer)):
+        trained.train(x, y, learning_rate=0.01, batch_size=10, shuffle=False, logging=False, optimizer=trained_optimizer)
+    for layer, resumed_layer in zip(network.layers, resumed.layers):
+        for name, param in layer.parameters().items():
+            np.testing.assert_array_equal(resumed_layer.parameters()[name], param)
@@ -0,0 +1,54 @@
+import pathlib
+import socket
+import sys
+
+import numpy as np
+import pytest
+
+import neural_network as nn
+from neural_network.distributed.launch import launch
+
+# the worker is a script the launcher runs, imported here for the network and data it trains on
+sys.path.append(str(pathlib.Path(__file__).parent))
+import distributed_worker as worker
+
+WORLD_SIZE = 3
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def run_ranks(output_folder, *args) -> list[dict[str, np.ndarray]]:
+    code = launch([worker.__file__, str(output_folder), *args], nproc=WORLD_SIZE, master_port=free_port())
+    assert code == 0
+    return [dict(np.load(output_folder / f"rank{rank}.npz")) for rank in range(WORLD_SIZE)]
+
+
+def single_process_parameters() -> dict[str, np.ndarray]:
+    """Rank 0's starting network trained on every ranks batch of each step together"""
+    network = worker.make_network(seed=0)
+    x, y = worker.make_data(WORLD_SIZE * worker.BATCH_SIZE * worker.STEPS)
+    network.train(x, y, learning_rate=0.1, batch_size=WORLD_SIZE * worker.BATCH_SIZE, shuffle=False, logging=False)
+    return worker.parameters(network)
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_ranks_end_identical_and_match_single_process(tmp_path, compress):
+    ranks = run_ranks(tmp_path, *(["--compress"] if compress else []))
+    expected = single_process_parameters()
+
+    for name, param in expected.items():
+        for rank in ranks[1:]:
+            np.testing.assert_array_equal(rank[name], ranks[0][name])
+        # float16 gradients only match roughly
+        np.testing.assert_allclose(ranks[0][name], param, rtol=1e-2 if compress else 1e-10, atol=1e-3 if compress else 1e-12)
+
+
+def test_allreduce_in_a_group_of_one_changes_nothing():
+    array = np.arange(5.0)
+    with nn.distributed.ProcessGroup() as group:
+        group.allreduce(array, average=True)
+    np.testing.assert_array_equal(array, np.arange(5.0))
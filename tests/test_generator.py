@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+import neural_network as nn
+
+activations, layers, losses = nn.activations, nn.layers, nn.losses
+
+WINDOW, VOCABULARY = 4, 5
+
+
+def make_network() -> nn.network.Network:
+    np.random.seed(0)
+    return nn.network.Network([
+        layers.SparseDense(WINDOW * VOCABULARY, 8), activations.ReLU(), layers.Dense(8, VOCABULARY), activations.Softmax(),
+    ], loss=losses.SparseCategoricalCrossEntropy())
+
+
+def window_indexes(tokens: list[int]) -> np.ndarray:
+    """SparseDense input for the last WINDOW tokens, the newest at the last position and -1 before the start"""
+    tail = tokens[-WINDOW:]
+    indexes = np.full(WINDOW, -1, dtype=np.intp)
+    positions = np.arange(WINDOW - len(tail), WINDOW)
+    indexes[positions] = positions * VOCABULARY + np.array(tail, dtype=np.intp)
+    return indexes
+
+
+def expected_probabilities(network, sequences: list[list[int]]) -> np.ndarray:
+    return network.predict(np.array([window_indexes(sequence) for sequence in sequences]))
+
+
+def test_probabilities_match_predict_as_the_window_wraps_around():
+    network = make_network()
+    generator = nn.network.SlidingWindowGenerator(network, WINDOW, VOCABULARY)
+    rng = np.random.default_rng(0)
+
+    sequence = []
+    for token in rng.integers(0, VOCABULARY, 3 * WINDOW):
+        sequence.append(int(token))
+        probabilities = generator.step(np.array([token]))
+        np.testing.assert_allclose(probabilities, expected_probabilities(network, [sequence]), rtol=1e-10, atol=1e-12)
+
+
+def test_batch_of_sequences_matches_predict_with_masked_pushes():
+    network = make_network()
+    generator = nn.network.SlidingWindowGenerator(network, WINDOW, VOCABULARY)
+    rng = np.random.default_rng(1)
+
+    # prompts shorter than, equal to and longer than the window
+    sequences = [[], [2], [1, 4, 0, 3], [0, 1, 2, 3, 4, 0, 1]]
+    generator.reset(sequences)
+    np.testing.assert_allclose(generator.probabilities(), expected_probabilities(network, sequences), rtol=1e-10, atol=1e-12)
+
+    for step in range(3 * WINDOW):
+        tokens = rng.integers(0, VOCABULARY, len(sequences))
+        # a different sequence sits out each step, its window must stay as it was
+        active = np.arange(len(sequences)) != step % len(sequences)
+        for sequence, token, is_active in zip(sequences, tokens, active):
+            if is_active:
+                sequence.append(int(token))
+
+        generator.push(tokens, active)
+        np.testing.assert_allclose(generator.probabilities(), expected_probabilities(network, sequences), rtol=1e-10, atol=1e-12)
+
+
+def test_network_without_matching_sparse_dense_is_rejected():
+    with pytest.raises(ValueError):
+        nn.network.SlidingWindowGenerator(make_network(), WINDOW + 1, VOCABULARY)
@@ -0,0 +1,41 @@
+import numpy as np
+
+import neural_network as nn
+from neural_network.network.model_file import convert_pickle
+
+
+def make_network() -> nn.network.Network:
+    return nn.network.Network([nn.layers.Dense(4, 3), nn.activations.Tanh(), nn.layers.Dense(3, 2)], loss=nn.losses.MSE())
+
+
+def test_dump_replaces_pkl_suffix_and_adds_it_after_other_dots(tmp_path):
+    network = make_network()
+    network.dump(tmp_path / "model.pkl")
+    network.dump(tmp_path / "model.best")
+    network.dump(tmp_path / "other.nnm")
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["model.best.nnm", "model.nnm", "other.nnm"]
+
+
+def test_dotted_names_load_and_fall_back_to_pkl(tmp_path):
+    network = make_network()
+    network.dump(tmp_path / "char-network-v1.5")
+    (tmp_path / "char-network-v2.0.pkl").write_bytes(network.dumps())
+
+    for name in ("char-network-v1.5", "char-network-v2.0"):
+        loaded = make_network()
+        loaded.load(tmp_path / name)
+        for layer, loaded_layer in zip(network.layers, loaded.layers):
+            for param_name, param in layer.parameters().items():
+                np.testing.assert_array_equal(loaded_layer.parameters()[param_name], param)
+
+
+def test_converted_pickle_loads_the_same_parameters(tmp_path):
+    network = make_network()
+    (tmp_path / "old.pkl").write_bytes(network.dumps())
+
+    convert_pickle(tmp_path / "old.pkl", make_network().layers, network.loss, network.dtype)
+    loaded = nn.network.Network.from_file(tmp_path / "old")
+
+    for layer, loaded_layer in zip(network.layers, loaded.layers):
+        for name, param in layer.parameters().items():
+            np.testing.assert_array_equal(loaded_layer.parameters()[name], param)
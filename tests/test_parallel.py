@@ -0,0 +1,58 @@
+import copy
+import weakref
+
+import numpy as np
+import pytest
+
+import neural_network as nn
+
+
+def make_network() -> nn.network.Network:
+    np.random.seed(0)
+    return nn.network.Network([
+        nn.layers.Dense(6, 16), nn.activations.Tanh(), nn.layers.Dense(16, 3), nn.activations.Softmax(),
+    ], loss=nn.losses.SparseCategoricalCrossEntropy())
+
+
+def parameters(network) -> list[np.ndarray]:
+    return [param.copy() for layer in network.layers for param in layer.parameters().values()]
+
+
+@pytest.mark.parametrize("optimizer_class", [nn.optimizers.SGD, nn.optimizers.Adam])
+@pytest.mark.parametrize("workers", [2, 3])
+def test_data_parallel_matches_single_process(workers, optimizer_class):
+    rng = np.random.default_rng(0)
+    x, y = rng.standard_normal((96, 6)), rng.integers(0, 3, 96)
+
+    network = make_network()
+    expected = copy.deepcopy(network)
+    expected.train(x, y, learning_rate=0.05, batch_size=12, shuffle=False, logging=False, optimizer=optimizer_class())
+
+    with nn.network.DataParallel(network, workers=workers):
+        network.train(x, y, learning_rate=0.05, batch_size=12, shuffle=False, logging=False, optimizer=optimizer_class())
+
+    # the batch is split between workers, so only the order of the sums differs
+    for param, expected_param in zip(parameters(network), parameters(expected)):
+        np.testing.assert_allclose(param, expected_param, rtol=1e-9, atol=1e-12)
+
+
+def test_hogwild_keeps_only_the_newest_optimizer():
+    rng = np.random.default_rng(1)
+    x, y = rng.standard_normal((48, 6)), rng.integers(0, 3, 48)
+    network = make_network()
+    loss = network.loss.forward(y, network.predict(x))
+
+    with nn.network.DataParallel(network, workers=2, hogwild=True) as parallel:
+        first = nn.optimizers.SGD()
+        network.train(x, y, learning_rate=0.05, batch_size=12, logging=False, optimizer=first)
+        first = weakref.ref(first)
+
+        # every call to train without an optimizer makes a new SGD, the one before it should not be kept
+        for _ in range(3):
+            network.train(x, y, learning_rate=0.05, batch_size=12, logging=False)
+        assert first() is None
+        last = nn.optimizers.SGD(momentum=0.9)
+        network.train(x, y, learning_rate=0.05, batch_size=12, logging=False, optimizer=last)
+        assert parallel._sent_optimizer is last
+
+    assert network.loss.forward(y, network.predict(x)) < loss
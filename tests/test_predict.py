@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+import neural_network as nn
+
+
+def make_network() -> nn.network.Network:
+    np.random.seed(0)
+    return nn.network.Network([nn.layers.Dense(4, 6), nn.activations.ReLU(), nn.layers.Dense(6, 3), nn.activations.Softmax()],
+                              loss=nn.losses.CategoricalCrossEntropy())
+
+
+@pytest.mark.parametrize("samples", [0, 1, 7, 20])
+def test_predict_matches_compute_and_fills_out(samples):
+    network = make_network()
+    x = np.random.default_rng(0).standard_normal((samples, 4))
+    out = np.full((samples, 3), np.nan)
+
+    assert network.predict(x, batch_size=8, out=out) is out
+    np.testing.assert_allclose(out, network.compute(x))
+    np.testing.assert_allclose(network.predict(x, batch_size=8), network.compute(x))
+
+
+@pytest.mark.parametrize("samples", [0, 5])
+def test_predict_rejects_out_of_the_wrong_shape(samples):
+    with pytest.raises(ValueError):
+        make_network().predict(np.zeros((samples, 4)), out=np.empty((samples, 2)))
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import neural_network as nn
+
+activations, layers, losses = nn.activations, nn.layers, nn.losses
+
+WRAPPED_METHODS = ("forward", "forward_into", "backward", "backward_into", "backward_from_output", "forward_backward")
+
+
+def make_network() -> nn.network.Network:
+    np.random.seed(0)
+    return nn.network.Network([
+        layers.Dense(4, 6), activations.Tanh(), layers.Dense(6, 3), activations.Softmax(),
+    ], loss=losses.CategoricalCrossEntropy(categorical_labels=False))
+
+
+def training_data():
+    rng = np.random.default_rng(0)
+    return rng.standard_normal((40, 4)), np.eye(3)[rng.integers(0, 3, 40)]
+
+
+def assert_unwrapped(network) -> None:
+    assert network._profiler is None
+    for target in [*network.layers, network.loss]:
+        assert not set(WRAPPED_METHODS) & set(vars(target)), type(target).__name__
+
+
+@pytest.mark.parametrize("compiled", [False, True])
+def test_counts_calls_of_every_layer_and_the_loss(compiled):
+    network = make_network()
+    if compiled:
+        network.compile((4,), batch_size=10)
+    x, y = training_data()
+
+    with nn.network.Profiler(network) as profiler:
+        network.train(x, y, batch_size=10, epochs=2, shuffle=False, logging=False)
+
+    # 4 batches for 2 epochs, the final Softmax is fused into the loss so it is never called
+    # batching also counts the call at the end of each epoch that finds there are no more batches
+    calls = {name: calls for name, (calls, _, _) in profiler.records.items()}
+    assert calls == {
+        "batching": 10, "step": 8,
+        "0 Dense forward": 8, "1 Tanh forward": 8, "2 Dense forward": 8,
+        "0 Dense backward": 8, "1 Tanh backward": 8, "2 Dense backward": 8,
+        "loss SoftmaxCategoricalCrossEntropy": 8,
+    }
+    assert_unwrapped(network)
+
+
+def test_layers_are_unwrapped_when_the_body_raises():
+    network = make_network()
+    x, y = training_data()
+
+    with pytest.raises(RuntimeError):
+        with nn.network.Profiler(network):
+            network.train(x, y, batch_size=10, logging=False)
+            raise RuntimeError("stop profiling")
+
+    assert_unwrapped(network)
+    # the network can be profiled again afterwards
+    with nn.network.Profiler(network) as profiler:
+        network.predict(x)
+    assert profiler.records["0 Dense forward"][0] == 1
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+import neural_network as nn
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_quantized_dense_error_is_within_rounding_bounds(dtype):
+    rng = np.random.default_rng(3)
+    np.random.seed(3)
+    dense = nn.layers.Dense(300, 40, dtype=dtype)
+    dense.set_parameters({"weights": rng.standard_normal((300, 40)), "biases": rng.standard_normal((1, 40))})
+    inputs = rng.standard_normal((16, 300)).astype(dtype)
+
+    quantized = nn.layers.QuantizedDense.from_dense(dense, block_size=64)
+    outputs = quantized.forward(inputs)
+    expected = dense.forward(inputs)
+    assert outputs.dtype == np.dtype(dtype)
+
+    # every weight and input is off by at most half a step of its scale
+    weight_step = np.max(np.abs(dense.weights.astype(np.float64)), axis=0) / 127
+    input_step = np.max(np.abs(inputs.astype(np.float64)), axis=1, keepdims=True) / 127
+    bound = (input_step / 2 * np.sum(np.abs(dense.weights), axis=0) + np.abs(inputs) @ np.full((300, 40), weight_step / 2)
+             + 300 * input_step * weight_step / 4)
+    error = np.abs(outputs.astype(np.float64) - expected)
+    assert np.all(error <= bound * 1.001 + 1e-5)
+    assert np.max(error / np.max(np.abs(expected))) < 0.05
+
+
+def test_quantized_dense_matches_the_integer_products():
+    np.random.seed(4)
+    dense = nn.layers.Dense(50, 6)
+    quantized = nn.layers.QuantizedDense.from_dense(dense)
+    inputs = np.random.default_rng(4).integers(-127, 128, (5, 50)).astype(np.float64)
+    inputs[:, 0] = 127
+
+    # inputs already on the int8 grid are not rounded, the integer sums are exact and only scaling back is done in float32
+    expected = (inputs @ quantized.weights.astype(np.float64)) * quantized.scales.astype(np.float64) + quantized.biases
+    np.testing.assert_allclose(quantized.forward(inputs), expected, rtol=1e-6, atol=1e-9)
+
+
+def test_quantized_dense_can_not_be_trained():
+    quantized = nn.layers.QuantizedDense.from_dense(nn.layers.Dense(4, 2))
+    with pytest.raises(TypeError):
+        quantized.backward(np.zeros((1, 4)), np.zeros((1, 2)), 0.1)
@@ -0,0 +1,89 @@
+import pathlib, sys
+
+import numpy as np
+import pytest
+
+import neural_network as nn
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent / "character-continue"))
+
+import network_util
+
+activations, layers, losses = nn.activations, nn.layers, nn.losses
+
+
+def random_probabilities(rows: int, vocabulary: int, seed: int = 0) -> np.ndarray:
+    return activations.Softmax().forward(np.random.default_rng(seed).standard_normal((rows, vocabulary)) * 3)
+
+
+def test_top_k_of_one_and_zero_temperature_pick_the_most_likely():
+    probabilities = random_probabilities(50, 10)
+    expected = np.argmax(probabilities, axis=1)
+
+    np.testing.assert_array_equal(nn.network.sample_tokens(probabilities, top_k=1), expected)
+    np.testing.assert_array_equal(nn.network.sample_tokens(probabilities, temperature=0), expected)
+
+
+def test_infinite_temperature_picks_evenly_from_top_k():
+    probabilities = random_probabilities(1, 10)
+    top = np.argsort(probabilities[0])[::-1]
+    rows = np.repeat(probabilities, 6000, axis=0)
+
+    # the character project samples this way when USE_PROBABILITIES is False, with top 1 it is the most likely char
+    np.testing.assert_array_equal(nn.network.sample_tokens(rows, top_k=1, temperature=np.inf), top[0])
+
+    counts = np.bincount(nn.network.sample_tokens(rows, top_k=3, temperature=np.inf, rng=np.random.default_rng(1)), minlength=10)
+    assert set(np.flatnonzero(counts)) == set(top[:3])
+    np.testing.assert_allclose(counts[top[:3]] / len(rows), 1 / 3, atol=0.03)
+
+
+@pytest.mark.parametrize("temperature", [0.5, 1.0, 2.0])
+def test_tokens_outside_top_k_are_never_sampled(temperature):
+    probabilities = random_probabilities(200, 10)
+    top = np.argsort(probabilities, axis=1)[:, -4:]
+
+    for seed in range(20):
+        picked = nn.network.sample_tokens(probabilities, top_k=4, temperature=temperature, rng=np.random.default_rng(seed))
+        assert np.all(np.any(top == picked[:, None], axis=1))
+
+
+def test_rng_for_each_row_gives_the_same_picks_as_sampling_rows_alone():
+    probabilities = random_probabilities(5, 10)
+
+    together = nn.network.sample_tokens(probabilities, top_k=6, rng=[np.random.default_rng(seed) for seed in range(5)])
+    alone = [nn.network.sample_tokens(probabilities[[row]], top_k=6, rng=[np.random.default_rng(row)])[0] for row in range(5)]
+    np.testing.assert_array_equal(together, alone)
+
+    with pytest.raises(ValueError):
+        nn.network.sample_tokens(probabilities, rng=[np.random.default_rng(0)])
+
+
+def make_generator() -> nn.network.SlidingWindowGenerator:
+    window, vocabulary = network_util.MAX_CHARS_IN_DATA, network_util.NUMBER_OF_CHARS_IN_RANGE
+    np.random.seed(0)
+    network = nn.network.Network([
+        layers.SparseDense(window * vocabulary, 16), activations.Tanh(), layers.Dense(16, vocabulary), activations.Softmax(),
+    ], loss=losses.SparseCategoricalCrossEntropy())
+    return nn.network.SlidingWindowGenerator(network, window, vocabulary)
+
+
+def continue_all(generator, messages, **kwargs) -> list[str]:
+    messages = list(messages)
+    for chars in network_util.continue_messages(generator, messages, lambda message: message.endswith("."), **kwargs):
+        for index, char in chars:
+            messages[index] += char
+    return messages
+
+
+def test_continuing_messages_together_matches_one_at_a_time():
+    generator = make_generator()
+    messages = ["Hello", "", "a much longer message than the window of the network", "Hi"] * 2
+
+    together = continue_all(generator, messages, top_k=8, max_new_chars=30,
+                            rng=[np.random.default_rng(seed) for seed in range(len(messages))])
+    alone = [continue_all(generator, [message], top_k=8, max_new_chars=30, rng=[np.random.default_rng(seed)])[0]
+             for seed, message in enumerate(messages)]
+
+    assert together == alone
+    # the same message with different generators should not all come out the same
+    assert len(set(together[::4])) > 1
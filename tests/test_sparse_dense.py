@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+import neural_network as nn
+
+
+def one_hot(indexes: np.ndarray, n_inputs: int) -> np.ndarray:
+    """Dense inputs for SparseDense indexes, a picked index adds one each time, -1 adds nothing"""
+    inputs = np.zeros((len(indexes), n_inputs))
+    for sample, row in enumerate(indexes):
+        for index in row[row >= 0]:
+            inputs[sample, index] += 1
+    return inputs
+
+
+@pytest.fixture
+def sparse_and_dense():
+    np.random.seed(0)
+    sparse, dense = nn.layers.SparseDense(20, 5), nn.layers.Dense(20, 5)
+    dense.set_parameters({"weights": sparse.weights.copy(), "biases": np.random.randn(1, 5)})
+    sparse.set_parameters({"biases": dense.biases.copy()})
+    # duplicate indexes in a sample, an index shared between samples, and -1 padding
+    indexes = np.array([[0, 3, 3], [3, 19, -1], [-1, -1, 7], [-1, -1, -1]])
+    return sparse, dense, indexes
+
+
+def test_sparse_dense_forward_matches_dense_on_one_hot(sparse_and_dense):
+    sparse, dense, indexes = sparse_and_dense
+    np.testing.assert_allclose(sparse.forward(indexes), dense.forward(one_hot(indexes, 20)), atol=1e-12)
+
+
+def test_sparse_dense_backward_matches_dense_on_one_hot(sparse_and_dense):
+    sparse, dense, indexes = sparse_and_dense
+    gradient = np.random.default_rng(1).standard_normal((len(indexes), 5))
+
+    assert sparse.backward(indexes, gradient, 0.1, nn.optimizers.SGD()) is None
+    dense.backward(one_hot(indexes, 20), gradient, 0.1, nn.optimizers.SGD())
+
+    np.testing.assert_allclose(sparse.weights, dense.weights, atol=1e-12)
+    np.testing.assert_allclose(sparse.biases, dense.biases, atol=1e-12)
+
+
+def test_sparse_dense_trains_like_dense_in_a_network():
+    rng = np.random.default_rng(2)
+    indexes = rng.integers(-1, 20, (32, 4))
+    labels = rng.integers(0, 3, 32)
+
+    def make(first_layer):
+        return nn.network.Network([first_layer, nn.activations.ReLU(), nn.layers.Dense(5, 3), nn.activations.Softmax()],
+                                  loss=nn.losses.SparseCategoricalCrossEntropy())
+
+    np.random.seed(0)
+    sparse_network = make(nn.layers.SparseDense(20, 5))
+    np.random.seed(0)
+    dense_network = make(nn.layers.Dense(20, 5))
+
+    sparse_network.train(indexes, labels, learning_rate=0.1, batch_size=8, shuffle=False, logging=False)
+    dense_network.train(one_hot(indexes, 20), labels, learning_rate=0.1, batch_size=8, shuffle=False, logging=False)
+
+    for sparse_layer, dense_layer in zip(sparse_network.layers, dense_network.layers):
+        for name, param in dense_layer.parameters().items():
+            np.testing.assert_allclose(sparse_layer.parameters()[name], param, atol=1e-12)
@@ -0,0 +1,23 @@
+import numpy as np
+
+import neural_network as nn
+
+
+def test_sparse_dense_summary_counts_picked_rows_and_index_inputs():
+    network = nn.network.Network([nn.layers.SparseDense(2375, 64), nn.activations.ReLU(), nn.layers.Dense(64, 10)],
+                                 loss=nn.losses.MSE(), dtype=np.float32)
+    summary = network.summary((25,), batch_size=16)
+
+    # 16 samples pick at most 400 rows, each with a gradient and a pick count per sample, then the biases
+    sparse_gradients = 400 * (64 + 16) + 64
+    assert summary.training_memory["parameter_gradients"] == (sparse_gradients + 64 * 10 + 10) * 4
+    assert summary.input_dtype == np.dtype(np.intp)
+    assert summary.inference_memory == 16 * 25 * np.dtype(np.intp).itemsize + 2 * 16 * 64 * 4
+
+
+def test_dense_summary_counts_every_parameter_gradient():
+    network = nn.network.Network([nn.layers.Dense(8, 4), nn.activations.Tanh(), nn.layers.Dense(4, 2)], loss=nn.losses.MSE())
+    summary = network.summary((8,), batch_size=5)
+
+    assert summary.training_memory["parameter_gradients"] == summary.parameters * 8
+    assert summary.input_dtype == np.dtype(np.float64)
@@ -100,7 +100,7 @@ class DQNAgent:
 
             # Get the expected score for the next states, in batch (better performance)
             next_states = np.array([next_state for (state, reward, done, next_state) in batch])
-            next_qs = [y[0] for y in self.network.compute(next_states)]
+            next_qs = self.network.predict(next_states)[:, 0]
 
             x = np.empty((len(batch), self.state_size), dtype=np.float64)
             y = np.empty((len(batch), 1), dtype=np.float64)